@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+class GenerationError(Exception):
+    """Raised when no model produced a response before its deadline"""
+
+class CircuitBreaker:
+    """Stops traffic to a model after repeated failures until a cooldown passes
+
+    After the cooldown one trial request is let through; success closes the
+    breaker again, failure re-opens it for another cooldown."""
+    def __init__(self, threshold=3, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half-open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def release(self):
+        """Let another trial through after one ended without an outcome, e.g. when it was cancelled"""
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+class ModelEndpoint:
+    """One model in the fallback chain along with its latency history and breaker"""
+    def __init__(self, name, model, breaker, window=200):
+        self.name = name
+        self.model = model
+        self.breaker = breaker
+        self.latencies = deque(maxlen=window)
+
+    def quantile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    async def call(self, prompt):
+        if hasattr(self.model, 'generate_content_async'):
+            response = await self.model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+        return response.text
+
+class ResilientModel:
+    """Gemini front end with per-call deadlines, hedging and ordered fallback
+
+    Each model gets `timeout` seconds. If the first request has not answered
+    after the model's observed p95 latency, an identical hedge request is sent
+    and whichever finishes first wins. Timeouts and errors count against the
+    model's circuit breaker and move on to the next model in the list."""
+    def __init__(self, models, timeout=30.0, hedge=True, hedge_delay=2.0, hedge_min_delay=0.25,
+                 hedge_quantile=0.95, min_samples=20, breaker_threshold=3, breaker_cooldown=60.0):
+        self.endpoints = [
+            ModelEndpoint(name, model, CircuitBreaker(breaker_threshold, breaker_cooldown))
+            for name, model in models
+        ]
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.hedges_sent = 0
+
+    @classmethod
+    def from_env(cls, factory, models=None):
+        """Build a client from GEMINI_* environment variables, creating models with factory(name)
+
+        models is a comma-separated fallback list; GEMINI_MODELS is used when it is not given."""
+        models = models or os.getenv('GEMINI_MODELS', 'gemini-2.0-flash-exp')
+        names = [name.strip() for name in models.split(',') if name.strip()]
+        return cls(
+            [(name, factory(name)) for name in names],
+            timeout=float(os.getenv('GEMINI_TIMEOUT', '30')),
+            hedge=os.getenv('GEMINI_HEDGE', 'true').lower() in ('1', 'true', 'yes'),
+            hedge_delay=float(os.getenv('GEMINI_HEDGE_DELAY', '2.0')),
+            breaker_threshold=int(os.getenv('GEMINI_BREAKER_THRESHOLD', '3')),
+            breaker_cooldown=float(os.getenv('GEMINI_BREAKER_COOLDOWN', '60')),
+        )
+
+    def hedge_delay_for(self, endpoint):
+        """Delay before sending a hedge: the model's p95, or the default until enough samples exist"""
+        if len(endpoint.latencies) < self.min_samples:
+            return self.hedge_delay
+        return max(self.hedge_min_delay, endpoint.quantile(self.hedge_quantile))
+
+    async def _call_hedged(self, endpoint, prompt):
+        deadline = time.monotonic() + self.timeout
+        tasks = [asyncio.create_task(endpoint.call(prompt))]
+        hedged = not self.hedge
+        error = None
+        try:
+            while tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                wait_for = remaining if hedged else min(remaining, self.hedge_delay_for(endpoint))
+                done, _ = await asyncio.wait(tasks, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not done and hedged and tasks:
+                    raise asyncio.TimeoutError()
+                if not hedged and tasks:
+                    # The first request is slower than usual, fire one duplicate
+                    hedged = True
+                    self.hedges_sent += 1
+                    log.debug("Hedging request to %s", endpoint.name)
+                    tasks.append(asyncio.create_task(endpoint.call(prompt)))
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate(self, prompt):
+        """Return the text of the first successful response across the fallback chain"""
+        errors = []
+        for endpoint in self.endpoints:
+            if not endpoint.breaker.allow():
+                errors.append(f"{endpoint.name}: circuit open")
+                continue
+            started = time.monotonic()
+            try:
+                text = await self._call_hedged(endpoint, prompt)
+            except asyncio.CancelledError:
+                # Cancellation says nothing about the model, but a half-open trial must not stay claimed
+                endpoint.breaker.release()
+                raise
+            except asyncio.TimeoutError:
+                self.record_failure(endpoint, f"timed out after {self.timeout:.0f}s")
+                errors.append(f"{endpoint.name}: timed out after {self.timeout:.0f}s")
+                continue
+            except Exception as e:
+                self.record_failure(endpoint, str(e))
+                errors.append(f"{endpoint.name}: {str(e)}")
+                continue
+            latency = time.monotonic() - started
+            endpoint.latencies.append(latency)
+            endpoint.breaker.record_success()
+            log.debug("Generated with %s", endpoint.name, extra={'data': {'model': endpoint.name, 'latency': round(latency, 3)}})
+            return text
+        raise GenerationError("All models failed (" + "; ".join(errors) + ")")
+
+    def record_failure(self, endpoint, reason):
+        endpoint.breaker.record_failure()
+        log.warning("Model %s failed: %s", endpoint.name, reason,
+                    extra={'data': {'model': endpoint.name, 'breaker': endpoint.breaker.state}})
+
+    def status(self):
+        """Per-model breaker state and latency quantiles, for diagnostics"""
+        return {
+            endpoint.name: {
+                'state': endpoint.breaker.state,
+                'p50': endpoint.quantile(0.5),
+                'p95': endpoint.quantile(0.95),
+                'samples': len(endpoint.latencies),
+            }
+            for endpoint in self.endpoints
+        }
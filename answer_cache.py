@@ -0,0 +1,173 @@
+"""Per-guild cache of /ask answers matched by question similarity.
+
+Questions are reduced to stemmed word counts without stop words and compared
+with TF-IDF cosine similarity. IDF is computed over the guild's own cached
+questions, so words every question shares count for little. Everything is in
+memory and offline. An inverted index limits scoring to entries that share a
+word with the new question, which keeps lookups well under a millisecond for a
+few thousand entries.
+
+Entries expire `ttl` seconds after they were stored. Once `max_entries` are
+cached across all guilds, the least recently used entry is evicted.
+"""
+import re
+import math
+import time
+import itertools
+from collections import Counter, OrderedDict
+
+WORD = re.compile(r"\w+")
+
+STOP_WORDS = frozenset("""
+a an the and or of to in on at by for from with about into as is are was were be been am
+i me my we our you your it its this that these those there here do does did can could would
+should will shall may might please so just any some
+""".split())
+
+def stem(word):
+    """Strip common English suffixes so "roles" matches "role" and "channels" matches "channel" """
+    for suffix in ('ing', 'ed', 's'):
+        if word.endswith(suffix) and not word.endswith('ss') and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def terms(text):
+    """Stemmed word counts of a question, ignoring stop words and single letters"""
+    words = (word for word in WORD.findall(text.lower()) if word not in STOP_WORDS)
+    return Counter(stem(word) for word in words if len(word) > 1 or word.isdigit())
+
+class CacheEntry:
+    __slots__ = ('question', 'answer', 'terms', 'created', 'hits')
+
+    def __init__(self, question, answer, question_terms):
+        self.question = question
+        self.answer = answer
+        self.terms = question_terms
+        self.created = time.monotonic()
+        self.hits = 0
+
+class GuildIndex:
+    """Cached questions of one guild with an inverted index and document frequencies"""
+    def __init__(self):
+        self.entries = {}
+        self.postings = {}
+        self.df = Counter()
+
+    def add(self, entry_id, entry):
+        self.entries[entry_id] = entry
+        for term in entry.terms:
+            self.postings.setdefault(term, set()).add(entry_id)
+            self.df[term] += 1
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        for term in entry.terms:
+            self.postings[term].discard(entry_id)
+            if not self.postings[term]:
+                del self.postings[term]
+            self.df[term] -= 1
+            if not self.df[term]:
+                del self.df[term]
+
+    def idf(self, term):
+        return math.log((1 + len(self.entries)) / (1 + self.df.get(term, 0))) + 1
+
+    def vector(self, question_terms):
+        vector = {term: count * self.idf(term) for term, count in question_terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return vector, norm
+
+    def matches(self, question_terms):
+        """Yield (entry_id, cosine similarity) for every entry sharing a term with the question"""
+        query, query_norm = self.vector(question_terms)
+        candidates = set()
+        for term in query:
+            candidates.update(self.postings.get(term, ()))
+        for entry_id in candidates:
+            vector, norm = self.vector(self.entries[entry_id].terms)
+            dot = sum(weight * vector[term] for term, weight in query.items() if term in vector)
+            yield entry_id, dot / (query_norm * norm)
+
+class AnswerCache:
+    """Answers keyed by guild and question similarity, with TTL and LRU eviction"""
+    def __init__(self, threshold=0.8, ttl=86400, max_entries=2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.indexes = {}
+        # (guild_id, entry_id), least recently used first
+        self.order = OrderedDict()
+        self.ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def __len__(self):
+        return len(self.order)
+
+    def expired(self, entry, now):
+        return now - entry.created > self.ttl
+
+    def lookup(self, guild_id, question):
+        """Return (entry, similarity) for the closest cached question at or above the threshold, or None"""
+        started = time.perf_counter()
+        try:
+            index = self.indexes.get(guild_id)
+            question_terms = terms(question)
+            best = None
+            if index and question_terms:
+                now = time.monotonic()
+                expired = []
+                for entry_id, similarity in index.matches(question_terms):
+                    if self.expired(index.entries[entry_id], now):
+                        expired.append(entry_id)
+                    elif similarity >= self.threshold and (best is None or similarity > best[1]):
+                        best = (entry_id, similarity)
+                for entry_id in expired:
+                    self.remove((guild_id, entry_id))
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.order.move_to_end((guild_id, best[0]))
+            entry = self.indexes[guild_id].entries[best[0]]
+            entry.hits += 1
+            return entry, best[1]
+        finally:
+            self.lookup_seconds += time.perf_counter() - started
+
+    def store(self, guild_id, question, answer):
+        question_terms = terms(question)
+        if not question_terms or self.max_entries <= 0:
+            return
+        self.expire()
+        entry_id = next(self.ids)
+        self.indexes.setdefault(guild_id, GuildIndex()).add(entry_id, CacheEntry(question, answer, question_terms))
+        self.order[(guild_id, entry_id)] = None
+        while len(self.order) > self.max_entries:
+            self.remove(next(iter(self.order)))
+
+    def remove(self, key):
+        guild_id, entry_id = key
+        del self.order[key]
+        index = self.indexes[guild_id]
+        index.remove(entry_id)
+        if not index.entries:
+            del self.indexes[guild_id]
+
+    def expire(self):
+        now = time.monotonic()
+        for guild_id, index in list(self.indexes.items()):
+            for entry_id in [entry_id for entry_id, entry in index.entries.items() if self.expired(entry, now)]:
+                self.remove((guild_id, entry_id))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.order),
+            'guilds': len(self.indexes),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'mean_lookup_ms': self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+        }
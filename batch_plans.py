@@ -0,0 +1,246 @@
+"""Generate server plans offline from a JSONL file of descriptions.
+
+Each input line is a JSON object with a "description" and an optional "id"
+(the line number is used when it is missing). Validated plans are appended to
+the output file as they finish, so the output doubles as the checkpoint: rerun
+the same command after an interruption and finished IDs are skipped. Items that
+still fail after every retry go to the errors file and are retried on the next
+run. Input lines that are not JSON objects with a "description" are also written
+to the errors file (by line number) and skipped.
+
+The errors file always describes what is still failing: on every run it is
+rewritten without items that have since been generated, with one record per
+item, and invalid input lines are reported afresh.
+
+Usage:
+    python batch_plans.py descriptions.jsonl plans.jsonl --concurrency 8 --retries 3
+    python batch_plans.py descriptions.jsonl plans.jsonl --fake-model
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+import argparse
+from plans import build_server_prompt, parse_server_plan
+from ai_client import ResilientModel
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Offline stand-in for a Gemini model that answers with a small valid plan"""
+    def __init__(self, failure_rate=0.0):
+        self.failure_rate = failure_rate
+
+    def generate_content(self, prompt):
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Simulated model failure")
+        name = prompt.split('"')[1][:90] if '"' in prompt else "Server"
+        plan = {
+            "server_config": {"name": name, "verification_level": 1, "explicit_content_filter": 1, "afk_timeout": 300},
+            "categories": [
+                {
+                    "name": "💬 General",
+                    "position": 0,
+                    "permissions": {},
+                    "channels": [
+                        {"name": "💬-chat", "type": "text", "topic": "General chat", "position": 0,
+                         "slowmode_delay": 0, "nsfw": False, "permissions": {}}
+                    ]
+                }
+            ],
+            "roles": [
+                {"name": "👑 Admin", "color": "#FF0000", "hoist": True, "mentionable": True,
+                 "permissions": {"administrator": True}}
+            ]
+        }
+        return FakeResponse("```json\n" + json.dumps(plan) + "\n```")
+
+def read_jsonl(path):
+    """Yield (line number, line) pairs, skipping blank lines"""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                yield line_number, line
+
+def parse_item(line_number, line):
+    """Return (id, description) for an input line, raising ValueError if it is malformed"""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    description = record.get('description')
+    if not isinstance(description, str) or not description.strip():
+        raise ValueError("missing \"description\"")
+    return str(record.get('id', line_number)), description
+
+def repair_tail(path):
+    """Make sure appends to a JSONL file start on a fresh line
+
+    A run interrupted mid-write leaves a torn final line. It is cut off so the
+    item is regenerated; a complete record that only lacks its newline is kept."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        cut = position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline != -1:
+                cut = start + newline + 1
+                break
+            position = start
+        else:
+            cut = 0
+        if cut == end:
+            return
+        f.seek(cut)
+        tail = f.read()
+        try:
+            json.loads(tail)
+            f.write(b'\n')
+        except ValueError:
+            f.truncate(cut)
+
+def load_checkpoint(path):
+    """Return the IDs already written to the output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)['id']))
+            except (ValueError, KeyError):
+                # A torn final line from an interrupted run is regenerated
+                continue
+    return done
+
+def compact_errors(path, done, keep_lines=True):
+    """Rewrite the errors file with the latest record of each item not in `done`
+
+    Records for invalid input lines are kept once each, or dropped entirely when
+    `keep_lines` is off because the input is about to be read again."""
+    if not os.path.exists(path):
+        return
+    latest = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final line
+            if record.get('id') is None:
+                if keep_lines:
+                    latest[('line', record.get('line'))] = record
+            elif str(record['id']) not in done:
+                latest[('id', str(record['id']))] = record
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        for record in latest.values():
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(temporary, path)
+
+async def generate_plan(model, description, retries, backoff=1.0):
+    """Generate and validate one plan, retrying failures with exponential backoff
+
+    model is a ResilientModel, so each attempt already has its own deadline,
+    hedging and fallback; these retries cover invalid or unparseable plans."""
+    prompt = build_server_prompt(description)
+    for attempt in range(retries + 1):
+        try:
+            return parse_server_plan(await model.generate(prompt))
+        except Exception:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt + random.random() * backoff)
+
+async def run_batch(model, input_path, output_path, errors_path, concurrency=8, retries=3, backoff=1.0):
+    """Generate plans for every pending description and return (succeeded, failed, skipped)"""
+    repair_tail(output_path)
+    finished = load_checkpoint(output_path)
+    compact_errors(errors_path, finished, keep_lines=False)
+    done = set(finished)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {'succeeded': 0, 'failed': 0, 'skipped': 0}
+
+    with open(output_path, 'a', encoding='utf-8') as out, open(errors_path, 'a', encoding='utf-8') as errors:
+        def write(f, record):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                item_id, description = item
+                try:
+                    plan = await generate_plan(model, description, retries, backoff)
+                    write(out, {'id': item_id, 'description': description, 'plan': plan})
+                    finished.add(item_id)
+                    counts['succeeded'] += 1
+                except Exception as e:
+                    write(errors, {'id': item_id, 'description': description, 'error': str(e)})
+                    counts['failed'] += 1
+                processed = counts['succeeded'] + counts['failed']
+                if processed % 100 == 0:
+                    print(f"{processed} processed ({counts['failed']} failed)", file=sys.stderr)
+                queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for line_number, line in read_jsonl(input_path):
+            try:
+                item_id, description = parse_item(line_number, line)
+            except ValueError as e:
+                # One bad line shouldn't stop the batch; it is reported with the failures
+                write(errors, {'id': None, 'line': line_number, 'error': f"Invalid input line: {e}"})
+                counts['failed'] += 1
+                continue
+            if item_id in done:
+                counts['skipped'] += 1
+                continue
+            done.add(item_id)
+            await queue.put((item_id, description))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    # Items retried this run replace their records from earlier runs
+    compact_errors(errors_path, finished)
+    return counts['succeeded'], counts['failed'], counts['skipped']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate server plans from a JSONL file of descriptions")
+    parser.add_argument('input', help="JSONL file with one {\"id\", \"description\"} object per line")
+    parser.add_argument('output', help="JSONL file validated plans are appended to")
+    parser.add_argument('--errors', help="JSONL file for items that failed (default: <output>.errors.jsonl)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Generations in flight at once")
+    parser.add_argument('--retries', type=int, default=3, help="Retries per item after the first attempt")
+    parser.add_argument('--models', help="Comma-separated Gemini fallback list (default: GEMINI_MODELS)")
+    parser.add_argument('--fake-model', action='store_true', help="Use an offline fake model instead of Gemini")
+    args = parser.parse_args(argv)
+
+    if args.fake_model:
+        model = ResilientModel([('fake', FakeModel())])
+    else:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+        load_dotenv()
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+        model = ResilientModel.from_env(genai.GenerativeModel, args.models)
+
+    errors_path = args.errors or os.path.splitext(args.output)[0] + '.errors.jsonl'
+    succeeded, failed, skipped = asyncio.run(
+        run_batch(model, args.input, args.output, errors_path, args.concurrency, args.retries)
+    )
+    print(f"Done: {succeeded} generated, {failed} failed, {skipped} already done")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
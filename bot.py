@@ -1,28 +1,214 @@
 import os
+import io
+import sys
 import json
+import fnmatch
+import logging
 import discord
+from discord import app_commands
 from discord.ext import commands
 import google.generativeai as genai
 from dotenv import load_dotenv
 import asyncio
+import time
 from typing import Optional
+from plans import build_server_prompt, clean_model_response, parse_server_plan, PlanValidationError
+from ai_client import ResilientModel
+from views import ask_yes_no, ask_choice, ask_channels, ask_text
+from permission_compiler import compile_permissions, EVERYONE
+from snapshots import SnapshotStore, capture_guild, restore_guild
+from answer_cache import AnswerCache
+import structured_logging
+from structured_logging import setup_logging, start_build, new_id
+import profiling
+from profiling import span
 
 # Load environment variables
 load_dotenv()
 
+# JSON logs are written from a background thread; see structured_logging for LOG_* settings
+setup_logging()
+log = logging.getLogger('bot')
+build_log = logging.getLogger('bot.build')
+fleet_log = logging.getLogger('bot.fleet')
+
 # Configure Google Generative AI
+# GEMINI_MODELS is an ordered fallback list; see ai_client.ResilientModel for deadlines and hedging
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+ai_model = ResilientModel.from_env(genai.GenerativeModel)
 
 # Configure Discord bot
-intents = discord.Intents.default()
-intents.message_content = True
-intents.guilds = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+# Commands are slash commands and prompts use buttons, so message content is only
+# needed to keep `!` prefix commands working; mentioning the bot works without it.
+MESSAGE_CONTENT_INTENT = os.getenv('MESSAGE_CONTENT_INTENT', 'false').lower() in ('1', 'true', 'yes')
+
+# CACHE_PROFILE=lean keeps only what the commands use (guilds, roles, channels and
+# the bot's own member) so one process can hold thousands of guilds
+CACHE_PROFILE = os.getenv('CACHE_PROFILE', 'default').lower()
+MESSAGE_CACHE_SIZE = os.getenv('MESSAGE_CACHE_SIZE')
+bot_options = {}
+if CACHE_PROFILE == 'lean':
+    intents = discord.Intents.none()
+    intents.guilds = True
+    # Slash commands and components arrive as interactions; message events are only for prefix commands
+    intents.guild_messages = MESSAGE_CONTENT_INTENT
+    intents.message_content = MESSAGE_CONTENT_INTENT
+    bot_options['max_messages'] = None
+    bot_options['member_cache_flags'] = discord.MemberCacheFlags.none()
+    bot_options['chunk_guilds_at_startup'] = False
+else:
+    intents = discord.Intents.default()
+    intents.message_content = MESSAGE_CONTENT_INTENT
+    intents.guilds = True
+if MESSAGE_CACHE_SIZE is not None:
+    bot_options['max_messages'] = int(MESSAGE_CACHE_SIZE) or None
+bot = commands.Bot(command_prefix=commands.when_mentioned_or('!'), intents=intents, **bot_options)
+
+# Fleet builds share one API budget across every guild being built
+FLEET_CONCURRENCY = int(os.getenv('FLEET_CONCURRENCY', '5'))
+API_RATE = float(os.getenv('API_RATE', '5'))
+
+class RateLimiter:
+    """Token bucket pacing Discord API calls shared across concurrent builds"""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        with span('rate_limit'):
+            async with self.lock:
+                while True:
+                    now = time.monotonic()
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+
+api_limiter = RateLimiter(API_RATE)
+
+# Plans waiting for /confirm or /cancel are dropped after PLAN_TTL seconds, so
+# sessions abandoned after /build_server don't keep their plans forever
+PLAN_TTL = float(os.getenv('PLAN_TTL', '3600'))
+
+class PendingPlans:
+    """Build plans waiting for /confirm, keyed by guild ID, that expire after `ttl` seconds"""
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.plans = {}
+
+    def expire(self):
+        now = time.monotonic()
+        for guild_id in [guild_id for guild_id, (stored, _) in self.plans.items() if now - stored > self.ttl]:
+            del self.plans[guild_id]
+
+    def put(self, guild_id, plan):
+        self.expire()
+        self.plans[guild_id] = (time.monotonic(), plan)
+
+    def get(self, guild_id):
+        self.expire()
+        entry = self.plans.get(guild_id)
+        return entry[1] if entry else None
+
+    def pop(self, guild_id):
+        entry = self.plans.pop(guild_id, None)
+        return entry[1] if entry else None
+
+    def __len__(self):
+        self.expire()
+        return len(self.plans)
+
+bot.server_plans = PendingPlans(PLAN_TTL)
+
+# Structure snapshots are written before anything destructive runs
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_RETENTION = int(os.getenv('SNAPSHOT_RETENTION', '10'))
+snapshot_store = SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_RETENTION)
+
+# Bulk channel content: how many AI generations run at once
+CONTENT_CONCURRENCY = int(os.getenv('CONTENT_CONCURRENCY', '4'))
+
+# /ask answers are reused for similar questions in the same guild (see answer_cache)
+answer_cache = AnswerCache(
+    threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.8')),
+    ttl=float(os.getenv('ANSWER_CACHE_TTL', '86400')),
+    max_entries=int(os.getenv('ANSWER_CACHE_SIZE', '2000')),
+)
+
+# /profile arms a one-off profile of the next of these commands in a guild
+PROFILED_COMMANDS = {'build_server', 'confirm', 'ask'}
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005'))
+profile_armed = set()
+
+@bot.event
+async def setup_hook():
+    # Register the slash versions of the hybrid commands
+    synced = await bot.tree.sync()
+    log.info("Synced %d application commands", len(synced))
+    
+    # Count time spent in Discord API calls towards profiles
+    request = bot.http.request
+    async def timed_request(*args, **kwargs):
+        with span('discord_api'):
+            return await request(*args, **kwargs)
+    bot.http.request = timed_request
 
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
+    log.info("%s has connected to Discord!", bot.user, extra={'data': {'guilds': len(bot.guilds)}})
+
+def bind_log_context(ctx):
+    """Tag every log record from this command invocation with its guild and a command ID"""
+    structured_logging.command_id.set(new_id())
+    structured_logging.command_name.set(ctx.command.qualified_name)
+    if ctx.guild:
+        structured_logging.guild_id.set(ctx.guild.id)
+
+@bot.before_invoke
+async def before_command(ctx):
+    bind_log_context(ctx)
+    # Start an armed profile; only one runs at a time, the others stay armed
+    if (ctx.guild and ctx.guild.id in profile_armed and ctx.command.qualified_name in PROFILED_COMMANDS
+            and profiling.current is None):
+        profile_armed.discard(ctx.guild.id)
+        ctx.profile = profiling.Profile(f"/{ctx.command.qualified_name} in {ctx.guild.name}", PROFILE_INTERVAL)
+        ctx.profile.start()
+        log.info("Profiling /%s", ctx.command.qualified_name)
+        # after_invoke is skipped when a slash invocation raises or is cancelled,
+        # so make sure the sampler and tracemalloc never outlive the command's task
+        asyncio.current_task().add_done_callback(lambda task: discard_profile(ctx))
+
+def discard_profile(ctx):
+    profile = getattr(ctx, 'profile', None)
+    if profile:
+        ctx.profile = None
+        profile.stop()
+        log.warning("Discarded profile of %s: the command did not finish", profile.label)
+
+async def finish_profile(ctx):
+    """Stop the command's profile, if any, and send it"""
+    profile = getattr(ctx, 'profile', None)
+    if profile:
+        ctx.profile = None
+        profile.stop()
+        await send_profile(ctx, profile)
+
+@bot.after_invoke
+async def after_command(ctx):
+    await finish_profile(ctx)
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, commands.CommandNotFound):
+        return
+    log.error("Command %s failed: %s", ctx.command, error, exc_info=error)
+    # A failed command still delivers its profile; that is often when it's wanted
+    await finish_profile(ctx)
 
 async def ensure_bot_role(ctx):
     """Ensure the bot has its own role with necessary permissions"""
@@ -120,43 +306,66 @@ async def create_bot_channel(ctx):
     )
     return bot_channel
 
-async def clean_server(ctx, preserve_bot=True):
-    """Remove all existing channels and roles while preserving bot role and channel"""
-    guild = ctx.guild
-    bot_role = discord.utils.get(guild.roles, name="🤖 Server Builder")
+async def take_snapshot(guild, reason):
+    """Capture a guild's structure and write it to disk off the event loop"""
+    snapshot_id = await asyncio.to_thread(snapshot_store.save, capture_guild(guild, reason))
+    log.info("Saved snapshot %s", snapshot_id, extra={'data': {'reason': reason}})
+    return snapshot_id
+
+async def pace():
+    """Fixed pause between Discord API calls in the interactive flows"""
+    with span('pacing'):
+        await asyncio.sleep(0.5)
+
+async def clean_guild(guild, pace, on_error, on_status=None, preserve_bot=True):
+    """Remove all channels and roles from a guild without prompting
+
+    A snapshot is saved first, and nothing is deleted if that fails. pace is
+    awaited after every API call and on_error receives a message for each item
+    that could not be deleted."""
+    snapshot_id = await take_snapshot(guild, 'cleanup')
+    if on_status:
+        await on_status(f"📸 Saved snapshot `{snapshot_id}` (use /restore to roll back)")
     bot_channel = discord.utils.get(guild.channels, name="bot-commands")
     
     # Delete all channels except bot channel if preserve_bot is True
-    await ctx.send("🧹 Cleaning up existing channels...")
+    if on_status:
+        await on_status("🧹 Cleaning up existing channels...")
     for channel in guild.channels:
         if preserve_bot and channel == bot_channel:
             continue
         try:
             await channel.delete()
-            await asyncio.sleep(0.5)  # Avoid rate limits
+            await pace()  # Avoid rate limits
         except discord.Forbidden:
-            await ctx.send(f"⚠️ Cannot delete channel: {channel.name}")
+            await on_error(f"⚠️ Cannot delete channel: {channel.name}")
         except Exception as e:
-            await ctx.send(f"Error deleting channel {channel.name}: {str(e)}")
+            await on_error(f"Error deleting channel {channel.name}: {str(e)}")
     
     # Delete all roles except @everyone and bot role if preserve_bot is True
-    await ctx.send("🧹 Cleaning up existing roles...")
+    if on_status:
+        await on_status("🧹 Cleaning up existing roles...")
     preserved_roles = {"@everyone"}
     if preserve_bot:
         preserved_roles.add("🤖 Server Builder")
     
     for role in guild.roles:
-        if role.name not in preserved_roles:
+        if role.name not in preserved_roles and not role.managed:
             try:
                 await role.delete()
-                await asyncio.sleep(0.5)  # Avoid rate limits
+                await pace()  # Avoid rate limits
             except discord.Forbidden:
-                await ctx.send(f"⚠️ Cannot delete role: {role.name}")
+                await on_error(f"⚠️ Cannot delete role: {role.name}")
             except Exception as e:
-                await ctx.send(f"Error deleting role {role.name}: {str(e)}")
+                await on_error(f"Error deleting role {role.name}: {str(e)}")
     
     return True
 
+async def clean_server(ctx, preserve_bot=True):
+    """Remove all existing channels and roles while preserving bot role and channel"""
+    return await clean_guild(ctx.guild, pace, lambda message: report_error(ctx, message),
+                             on_status=ctx.send, preserve_bot=preserve_bot)
+
 async def cleanup_bot_resources(ctx):
     """Clean up bot's role and channel"""
     guild = ctx.guild
@@ -166,21 +375,76 @@ async def cleanup_bot_resources(ctx):
     if bot_channel:
         try:
             await bot_channel.delete()
-            await asyncio.sleep(0.5)
+            await pace()
         except Exception as e:
             await ctx.send(f"⚠️ Could not delete bot channel: {str(e)}")
     
     if bot_role:
         try:
             await bot_role.delete()
-            await asyncio.sleep(0.5)
+            await pace()
         except Exception as e:
             await ctx.send(f"⚠️ Could not delete bot role: {str(e)}")
 
+def plan_permissions(server_plan):
+    """Compile a plan's permissions into minimal overwrites (see permission_compiler)"""
+    return compile_permissions(server_plan, discord.Permissions.VALID_FLAGS)
+
+def build_overwrites(permissions, roles_map):
+    """Turn a compiled role_name -> permissions mapping into discord overwrites"""
+    return {
+        roles_map[role_name]: discord.PermissionOverwrite(**perms)
+        for role_name, perms in permissions.items()
+        if role_name in roles_map
+    }
+
+async def create_plan_channel(category, channel_data, overwrites):
+    """Create one channel described by a plan inside the given category"""
+    channel_type = channel_data['type'].lower()
+    if channel_type == 'text':
+        return await category.create_text_channel(
+            name=channel_data['name'],
+            topic=channel_data.get('topic', ''),
+            slowmode_delay=channel_data.get('slowmode_delay', 0),
+            nsfw=channel_data.get('nsfw', False),
+            overwrites=overwrites,
+            position=channel_data.get('position', discord.utils.MISSING)
+        )
+    elif channel_type == 'voice':
+        return await category.create_voice_channel(
+            name=channel_data['name'],
+            overwrites=overwrites,
+            position=channel_data.get('position', discord.utils.MISSING)
+        )
+    elif channel_type == 'forum':
+        return await category.create_forum(
+            name=channel_data['name'],
+            topic=channel_data.get('topic', ''),
+            overwrites=overwrites,
+            position=channel_data.get('position', discord.utils.MISSING)
+        )
+    return None
+
+async def report_error(ctx, message):
+    """Send an error to the user and record it in the build log"""
+    build_log.warning(message)
+    await ctx.send(message)
+
+async def confirm_continue(ctx, question):
+    """Ask the command author whether to carry on after an error; a timeout stops the setup"""
+    answer = await ask_yes_no(ctx, ctx.author, question)
+    if answer is None:
+        await ctx.send("No response received, stopping setup.")
+        return False
+    return answer
+
 async def create_server_structure(ctx, server_plan):
     """Create channels, roles, and configure server based on the plan"""
     try:
         guild = ctx.guild
+        start_build()
+        build_log.info("Starting server configuration", extra={'data': {
+            'roles': len(server_plan['roles']), 'categories': len(server_plan['categories'])}})
         await ctx.send("🚀 Starting server configuration...")
         
         # Clean up existing channels and roles first
@@ -189,20 +453,14 @@ async def create_server_structure(ctx, server_plan):
             await clean_server(ctx, preserve_bot=True)
             await ctx.send("✅ Cleanup completed")
         except Exception as e:
-            await ctx.send(f"⚠️ Error during cleanup: {str(e)}")
-            await ctx.send("Would you like to continue anyway? (yes/no)")
-            try:
-                msg = await bot.wait_for('message', timeout=30.0, 
-                    check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                if msg.content.lower() == 'no':
-                    return False
-            except asyncio.TimeoutError:
-                await ctx.send("No response received, stopping setup.")
+            await report_error(ctx, f"⚠️ Error during cleanup: {str(e)}")
+            if not await confirm_continue(ctx, "Would you like to continue anyway?"):
                 return False
         
         # Create roles first (to use in channel permissions)
         await ctx.send("👥 Creating roles...")
-        roles_map = {}  # Store created roles for permission setup
+        roles_map = {EVERYONE: guild.default_role}  # Store created roles for permission setup
+        compiled = plan_permissions(server_plan)
         for role_data in server_plan['roles']:
             try:
                 role = await guild.create_role(
@@ -214,30 +472,19 @@ async def create_server_structure(ctx, server_plan):
                 )
                 roles_map[role_data['name']] = role
                 await ctx.send(f"✅ Created role: {role.name}")
-                await asyncio.sleep(0.5)
+                await pace()
             except Exception as e:
-                await ctx.send(f"⚠️ Error creating role {role_data['name']}: {str(e)}")
-                await ctx.send("Would you like to continue with the next role? (yes/no)")
-                try:
-                    msg = await bot.wait_for('message', timeout=30.0, 
-                        check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                    if msg.content.lower() == 'no':
-                        return False
-                    continue
-                except asyncio.TimeoutError:
-                    await ctx.send("No response received, stopping setup.")
+                await report_error(ctx, f"⚠️ Error creating role {role_data['name']}: {str(e)}")
+                if not await confirm_continue(ctx, "Would you like to continue with the next role?"):
                     return False
+                continue
         
         # Create categories and channels
         await ctx.send("📁 Creating categories and channels...")
-        for category_data in server_plan['categories']:
+        for category_data, compiled_category in zip(server_plan['categories'], compiled['categories']):
             try:
                 # Set up category permissions
-                overwrites = {}
-                if 'permissions' in category_data:
-                    for role_name, perms in category_data['permissions'].items():
-                        if role_name in roles_map:
-                            overwrites[roles_map[role_name]] = discord.PermissionOverwrite(**perms)
+                overwrites = build_overwrites(compiled_category['overwrites'], roles_map)
                 
                 # Create category
                 category = await guild.create_category(
@@ -246,84 +493,41 @@ async def create_server_structure(ctx, server_plan):
                     position=category_data['position']
                 )
                 await ctx.send(f"✅ Created category: {category.name}")
-                await asyncio.sleep(0.5)
+                await pace()
                 
                 # Create channels in category
-                for channel_data in category_data.get('channels', []):
+                for channel_data, compiled_channel in zip(category_data.get('channels', []), compiled_category['channels']):
                     try:
                         channel_type = channel_data['type'].lower()
-                        channel_overwrites = overwrites.copy()
                         
-                        # Add channel-specific permission overwrites
-                        if 'permissions' in channel_data:
-                            for role_name, perms in channel_data['permissions'].items():
-                                if role_name in roles_map:
-                                    channel_overwrites[roles_map[role_name]] = discord.PermissionOverwrite(**perms)
+                        # Synced channels reuse the category's overwrites; others get their minimal set
+                        if compiled_channel['sync']:
+                            channel_overwrites = overwrites
+                        else:
+                            channel_overwrites = build_overwrites(compiled_channel['overwrites'], roles_map)
                         
                         try:
-                            if channel_type == 'text':
-                                await category.create_text_channel(
-                                    name=channel_data['name'],
-                                    topic=channel_data.get('topic', ''),
-                                    slowmode_delay=channel_data.get('slowmode_delay', 0),
-                                    nsfw=channel_data.get('nsfw', False),
-                                    overwrites=channel_overwrites,
-                                    position=channel_data.get('position', 0)
-                                )
-                            elif channel_type == 'voice':
-                                await category.create_voice_channel(
-                                    name=channel_data['name'],
-                                    overwrites=channel_overwrites,
-                                    position=channel_data.get('position', 0)
-                                )
-                            elif channel_type == 'forum':
-                                await category.create_forum(
-                                    name=channel_data['name'],
-                                    topic=channel_data.get('topic', ''),
-                                    overwrites=channel_overwrites,
-                                    position=channel_data.get('position', 0)
-                                )
+                            await create_plan_channel(category, channel_data, channel_overwrites)
                             await ctx.send(f"✅ Created {channel_type} channel: {channel_data['name']}")
                         except Exception as e:
-                            await ctx.send(f"⚠️ Error creating {channel_type} channel {channel_data['name']}: {str(e)}")
-                            await ctx.send("Would you like to continue with the next channel? (yes/no)")
-                            try:
-                                msg = await bot.wait_for('message', timeout=30.0, 
-                                    check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                                if msg.content.lower() == 'no':
-                                    return False
-                                continue
-                            except asyncio.TimeoutError:
-                                await ctx.send("No response received, stopping setup.")
+                            await report_error(ctx, f"⚠️ Error creating {channel_type} channel {channel_data['name']}: {str(e)}")
+                            if not await confirm_continue(ctx, "Would you like to continue with the next channel?"):
                                 return False
+                            continue
                         
-                        await asyncio.sleep(0.5)
+                        await pace()
                         
                     except Exception as e:
-                        await ctx.send(f"⚠️ Error with channel {channel_data['name']}: {str(e)}")
-                        await ctx.send("Would you like to continue with the next channel? (yes/no)")
-                        try:
-                            msg = await bot.wait_for('message', timeout=30.0, 
-                                check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                            if msg.content.lower() == 'no':
-                                return False
-                            continue
-                        except asyncio.TimeoutError:
-                            await ctx.send("No response received, stopping setup.")
+                        await report_error(ctx, f"⚠️ Error with channel {channel_data['name']}: {str(e)}")
+                        if not await confirm_continue(ctx, "Would you like to continue with the next channel?"):
                             return False
+                        continue
                         
             except Exception as e:
-                await ctx.send(f"⚠️ Error creating category {category_data['name']}: {str(e)}")
-                await ctx.send("Would you like to continue with the next category? (yes/no)")
-                try:
-                    msg = await bot.wait_for('message', timeout=30.0, 
-                        check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                    if msg.content.lower() == 'no':
-                        return False
-                    continue
-                except asyncio.TimeoutError:
-                    await ctx.send("No response received, stopping setup.")
+                await report_error(ctx, f"⚠️ Error creating category {category_data['name']}: {str(e)}")
+                if not await confirm_continue(ctx, "Would you like to continue with the next category?"):
                     return False
+                continue
         
         # Update server settings
         if 'server_config' in server_plan:
@@ -337,276 +541,289 @@ async def create_server_structure(ctx, server_plan):
                 )
                 await ctx.send("✅ Server settings updated")
             except Exception as e:
-                await ctx.send(f"⚠️ Error updating server settings: {str(e)}")
-                await ctx.send("Would you like to continue anyway? (yes/no)")
-                try:
-                    msg = await bot.wait_for('message', timeout=30.0, 
-                        check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                    if msg.content.lower() == 'no':
-                        return False
-                except asyncio.TimeoutError:
-                    await ctx.send("No response received, stopping setup.")
+                await report_error(ctx, f"⚠️ Error updating server settings: {str(e)}")
+                if not await confirm_continue(ctx, "Would you like to continue anyway?"):
                     return False
         
+        build_log.info("Server structure creation completed")
         await ctx.send("✨ Server structure creation completed!")
         
         # Ask about additional changes
         while True:
-            await ctx.send("Would you like to make any additional changes? Choose an option:\n1. Add more channels\n2. Add more roles\n3. Add channel content (rules, info, etc.)\n4. No more changes (done)")
-            try:
-                msg = await bot.wait_for('message', timeout=30.0, 
-                    check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content in ['1', '2', '3', '4'])
-                
-                if msg.content == '1':
-                    await ctx.send("Please describe the additional channels you'd like to add:")
-                    desc = await bot.wait_for('message', timeout=60.0, 
-                        check=lambda m: m.author == ctx.author and m.channel == ctx.channel)
-                    # Generate and add new channels using AI
-                    new_channels = await generate_channels(desc.content)
-                    # Add the new channels to existing categories
-                    await add_channels(ctx, new_channels, roles_map)
-                
-                elif msg.content == '2':
-                    await ctx.send("Please describe the additional roles you'd like to add:")
-                    desc = await bot.wait_for('message', timeout=60.0, 
-                        check=lambda m: m.author == ctx.author and m.channel == ctx.channel)
-                    # Generate and add new roles using AI
-                    new_roles = await generate_roles(desc.content)
-                    await add_roles(ctx, new_roles)
-                
-                elif msg.content == '3':
-                    # Ask about adding content to specific channels
-                    channels = [c for c in ctx.guild.channels if isinstance(c, discord.TextChannel)]
-                    channel_list = "\n".join([f"{i+1}. {c.name}" for i, c in enumerate(channels)])
-                    await ctx.send(f"Which channel would you like to add content to? (enter the number)\n{channel_list}\n{len(channels)+1}. Done adding content")
-                    
-                    while True:
-                        try:
-                            msg = await bot.wait_for('message', timeout=30.0, 
-                                check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.isdigit() and 1 <= int(m.content) <= len(channels)+1)
-                            
-                            if int(msg.content) == len(channels)+1:
-                                break
-                                
-                            selected_channel = channels[int(msg.content)-1]
-                            await ctx.send(f"What content would you like to add to #{selected_channel.name}? (type your content or 'skip' to skip)")
-                            content = await bot.wait_for('message', timeout=120.0, 
-                                check=lambda m: m.author == ctx.author and m.channel == ctx.channel)
-                            
-                            if content.content.lower() != 'skip':
-                                # Generate formatted content using AI
-                                formatted_content = await generate_channel_content(selected_channel.name, content.content)
-                                await selected_channel.send(formatted_content)
-                                await ctx.send(f"✅ Content added to #{selected_channel.name}")
-                            
-                            await ctx.send("Would you like to add content to another channel? (yes/no)")
-                            continue_resp = await bot.wait_for('message', timeout=30.0, 
-                                check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-                            if continue_resp.content.lower() == 'no':
-                                break
-                                
-                        except asyncio.TimeoutError:
-                            await ctx.send("No response received, skipping content addition")
-                            break
-                
-                elif msg.content == '4':
+            choice = await ask_choice(ctx, ctx.author, "Would you like to make any additional changes? Choose an option:",
+                                      ["Add more channels", "Add more roles", "Add channel content",
+                                       "Add content to many channels", "No more changes (done)"])
+            if choice is None:
+                await ctx.send("No response received, moving on")
+                break
+            
+            if choice == 0:
+                desc = await ask_text(ctx, ctx.author, "Please describe the additional channels you'd like to add:",
+                                      "Describe channels", "Additional channels", "Channel description")
+                if desc is None:
+                    await ctx.send("No response received, moving on")
+                    break
+                # Generate and add new channels using AI
+                new_channels = await generate_channels(desc, [c.name for c in ctx.guild.channels])
+                # Add the new channels to existing categories
+                for page in paginate("\n".join(await add_channels(ctx.guild, new_channels)) or "Nothing new to add"):
+                    await ctx.send(page)
+            
+            elif choice == 1:
+                desc = await ask_text(ctx, ctx.author, "Please describe the additional roles you'd like to add:",
+                                      "Describe roles", "Additional roles", "Role description")
+                if desc is None:
+                    await ctx.send("No response received, moving on")
                     break
+                # Generate and add new roles using AI
+                new_roles = await generate_roles(desc, [r.name for r in ctx.guild.roles])
+                for page in paginate("\n".join(await add_roles(ctx.guild, new_roles)) or "Nothing new to add"):
+                    await ctx.send(page)
+            
+            elif choice == 2:
+                # Ask about adding content to specific channels
+                while True:
+                    selected = await ask_channels(ctx, ctx.author, "Which channel would you like to add content to?")
+                    if not selected:
+                        await ctx.send("No response received, skipping content addition")
+                        break
+                    selected_channel = selected[0]
                     
-            except asyncio.TimeoutError:
-                await ctx.send("No response received, moving on")
+                    content = await ask_text(ctx, ctx.author, f"What content would you like to add to #{selected_channel.name}?",
+                                             "Write content", f"Content for #{selected_channel.name}", "Content description",
+                                             timeout=120.0)
+                    if content is None:
+                        await ctx.send("No response received, skipping content addition")
+                        break
+                    
+                    # Generate formatted content using AI
+                    formatted_content = await generate_channel_content(selected_channel.name, content)
+                    for page in paginate(formatted_content):
+                        await selected_channel.send(page)
+                    await ctx.send(f"✅ Content added to #{selected_channel.name}")
+                    
+                    if not await ask_yes_no(ctx, ctx.author, "Would you like to add content to another channel?"):
+                        break
+            
+            elif choice == 3:
+                selected = await ask_channels(ctx, ctx.author, "Which channels would you like to add content to?",
+                                              timeout=60.0, max_values=25)
+                if not selected:
+                    await ctx.send("No response received, skipping content addition")
+                    continue
+                content = await ask_text(ctx, ctx.author, f"What content would you like to add to these {len(selected)} channels?",
+                                         "Write content", "Content for selected channels", "Content description",
+                                         timeout=120.0)
+                if content is None:
+                    await ctx.send("No response received, skipping content addition")
+                    continue
+                await ctx.send(f"✍️ Generating content for {len(selected)} channels...")
+                await report_fill_results(ctx, await fill_channels(selected, content))
+            
+            else:
                 break
         
         # Ask about cleanup at the very end
-        await ctx.send("🧹 Would you like me to clean up the bot's channel and role? (yes/no)")
-        try:
-            msg = await bot.wait_for('message', timeout=30.0, 
-                check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-            if msg.content.lower() == 'yes':
-                await clean_server(ctx, preserve_bot=False)
-                await ctx.send("✅ Cleanup completed")
-            else:
-                await ctx.send("Keeping bot's channel and role")
-        except asyncio.TimeoutError:
+        answer = await ask_yes_no(ctx, ctx.author, "🧹 Would you like me to clean up the bot's channel and role?")
+        if answer is None:
             await ctx.send("No response received, keeping bot's channel and role")
+        elif answer:
+            await clean_server(ctx, preserve_bot=False)
+            await ctx.send("✅ Cleanup completed")
+        else:
+            await ctx.send("Keeping bot's channel and role")
         
         return True
         
     except Exception as e:
+        build_log.exception("Unexpected error during build")
         await ctx.send(f"❌ An unexpected error occurred: {str(e)}")
-        await ctx.send("Would you like to try continuing? (yes/no)")
+        return await confirm_continue(ctx, "Would you like to try continuing?")
+
+async def apply_server_plan(guild, server_plan, limiter=api_limiter, on_status=None):
+    """Apply a plan to a guild without any prompts and return the list of failures"""
+    errors = []
+
+    async def record(message):
+        fleet_log.warning(message)
+        errors.append(message)
+
+    async def status(message):
+        fleet_log.info("Fleet build stage: %s", message)
+        if on_status:
+            await on_status(guild, message)
+
+    await status("cleaning")
+    await clean_guild(guild, limiter.acquire, record)
+
+    await status("creating roles")
+    roles_map = {EVERYONE: guild.default_role}
+    compiled = plan_permissions(server_plan)
+    for role_data in server_plan['roles']:
         try:
-            msg = await bot.wait_for('message', timeout=30.0, 
-                check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.lower() in ['yes', 'no'])
-            if msg.content.lower() == 'yes':
-                return True
-            return False
-        except asyncio.TimeoutError:
-            await ctx.send("No response received, stopping setup.")
-            return False
-
-@bot.command(name='build_server')
+            await limiter.acquire()
+            role = await guild.create_role(
+                name=role_data['name'],
+                color=discord.Color.from_str(role_data['color']),
+                hoist=role_data['hoist'],
+                mentionable=role_data['mentionable'],
+                permissions=discord.Permissions(**role_data['permissions'])
+            )
+            roles_map[role_data['name']] = role
+        except Exception as e:
+            await record(f"Error creating role {role_data['name']}: {str(e)}")
+
+    await status("creating channels")
+    for category_data, compiled_category in zip(server_plan['categories'], compiled['categories']):
+        try:
+            overwrites = build_overwrites(compiled_category['overwrites'], roles_map)
+            await limiter.acquire()
+            category = await guild.create_category(
+                name=category_data['name'],
+                overwrites=overwrites,
+                position=category_data['position']
+            )
+        except Exception as e:
+            await record(f"Error creating category {category_data['name']}: {str(e)}")
+            continue
+
+        for channel_data, compiled_channel in zip(category_data.get('channels', []), compiled_category['channels']):
+            try:
+                if compiled_channel['sync']:
+                    channel_overwrites = overwrites
+                else:
+                    channel_overwrites = build_overwrites(compiled_channel['overwrites'], roles_map)
+                await limiter.acquire()
+                await create_plan_channel(category, channel_data, channel_overwrites)
+            except Exception as e:
+                await record(f"Error creating channel {channel_data['name']}: {str(e)}")
+
+    if 'server_config' in server_plan:
+        await status("updating settings")
+        try:
+            await limiter.acquire()
+            await guild.edit(
+                name=server_plan['server_config']['name'],
+                verification_level=discord.VerificationLevel(server_plan['server_config']['verification_level']),
+                explicit_content_filter=discord.ContentFilter(server_plan['server_config']['explicit_content_filter']),
+                afk_timeout=server_plan['server_config']['afk_timeout']
+            )
+        except Exception as e:
+            await record(f"Error updating server settings: {str(e)}")
+
+    await status("done" if not errors else f"done with {len(errors)} error(s)")
+    return errors
+
+async def run_fleet(server_plan, guild_ids, concurrency=FLEET_CONCURRENCY, limiter=api_limiter, on_status=None):
+    """Apply one plan to many guilds in parallel
+
+    Every guild draws from the same rate limiter, so adding guilds raises
+    parallelism without raising the overall API request rate. Returns a
+    mapping of guild ID to the failures seen while building it."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def build(guild_id):
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            results[guild_id] = ["Bot is not a member of this guild"]
+            return
+        async with semaphore:
+            # Each guild runs in its own task, so these only tag this guild's log records
+            structured_logging.guild_id.set(guild_id)
+            start_build()
+            try:
+                results[guild_id] = await apply_server_plan(guild, server_plan, limiter, on_status)
+            except Exception as e:
+                fleet_log.exception("Fleet build aborted")
+                results[guild_id] = [f"Build aborted: {str(e)}"]
+
+    await asyncio.gather(*(build(guild_id) for guild_id in guild_ids))
+    return results
+
+class FleetProgress:
+    """A single status message listing the build stage of every guild in a fleet run"""
+    def __init__(self, channel, guild_ids, interval=2.0):
+        self.channel = channel
+        self.states = {guild_id: "queued" for guild_id in guild_ids}
+        self.interval = interval
+        self.message = None
+        self.last_edit = 0.0
+
+    def render(self):
+        lines = [f"`{guild_id}` {state}" for guild_id, state in self.states.items()]
+        text = "**Fleet build progress**\n" + "\n".join(lines)
+        return text if len(text) <= 2000 else text[:1990] + "\n…"
+
+    async def start(self):
+        self.message = await self.channel.send(self.render())
+
+    async def update(self, guild, state):
+        self.states[guild.id] = f"{guild.name}: {state}"
+        if time.monotonic() - self.last_edit >= self.interval:
+            await self.flush()
+
+    async def flush(self):
+        self.last_edit = time.monotonic()
+        try:
+            await self.message.edit(content=self.render())
+        except Exception:
+            pass
+
+@bot.hybrid_command(name='build_server')
 @commands.has_permissions(administrator=True)
-async def build_server(ctx, *, description):
+@app_commands.default_permissions(administrator=True)
+async def build_server(ctx, *, description: str):
     """Build a server based on the provided description"""
+    bot_channel = None
     try:
+        await ctx.defer()
         # Log the start of the command
-        print(f"Starting build_server command in channel {ctx.channel.name} ({ctx.channel.id})")
+        start_build()
+        build_log.info("Starting build_server command in channel %s (%s)", ctx.channel.name, ctx.channel.id)
         
         # Create or get bot role first
         try:
             bot_role = await ensure_bot_role(ctx)
             if not bot_role:
-                print("Failed to create/get bot role")
+                build_log.warning("Failed to create/get bot role")
                 return
-            print("Bot role setup successful")
+            build_log.info("Bot role setup successful")
         except Exception as e:
             await ctx.send(f"❌ Error during bot role setup: {str(e)}")
-            print(f"Bot role error: {str(e)}")
+            build_log.exception("Bot role error")
             return
             
         # Create or get bot channel
         try:
             bot_channel = await create_bot_channel(ctx)
             if not bot_channel:
-                print("Failed to create/get bot channel")
+                build_log.warning("Failed to create/get bot channel")
                 await ctx.send("❌ Failed to create or access bot channel")
                 return
-            print(f"Bot channel setup successful: {bot_channel.name} ({bot_channel.id})")
+            build_log.info("Bot channel setup successful: %s (%s)", bot_channel.name, bot_channel.id)
         except Exception as e:
             await ctx.send(f"❌ Error during bot channel setup: {str(e)}")
-            print(f"Bot channel error: {str(e)}")
+            build_log.exception("Bot channel error")
             return
         
         # If we're not in the bot channel, redirect there
         if ctx.channel.id != bot_channel.id:
             await ctx.send(f"📢 Please use {bot_channel.mention} for bot commands!")
-            print("Redirecting user to bot channel")
+            build_log.info("Redirecting user to bot channel")
             return
         
         await ctx.send("🤔 Analyzing your server requirements...")
-        print("Starting server analysis")
-        
-        example_json = '{"server_config": {"name": "Gaming Hub","verification_level": 1},"categories": [],"roles": []}'
-        schema_json = '''{
-    "server_config": {
-        "name": "string",
-        "verification_level": "number (0-4)",
-        "explicit_content_filter": "number (0-2)",
-        "afk_timeout": "number (60, 300, 900, 1800, 3600)"
-    },
-    "categories": [
-        {
-            "name": "string (with emoji)",
-            "position": "number",
-            "permissions": {
-                "role_name": {
-                    "view_channel": "boolean",
-                    "send_messages": "boolean"
-                }
-            },
-            "channels": [
-                {
-                    "name": "string (with emoji)",
-                    "type": "text/voice/forum",
-                    "topic": "string",
-                    "position": "number",
-                    "slowmode_delay": "number",
-                    "nsfw": "boolean",
-                    "permissions": {}
-                }
-            ]
-        }
-    ],
-    "roles": [
-        {
-            "name": "string (with emoji)",
-            "color": "string (hex color)",
-            "hoist": "boolean",
-            "mentionable": "boolean",
-            "permissions": {
-                "administrator": "boolean",
-                "manage_channels": "boolean",
-                "manage_roles": "boolean",
-                "manage_messages": "boolean",
-                "view_channel": "boolean",
-                "send_messages": "boolean",
-                "read_message_history": "boolean",
-                "connect": "boolean",
-                "speak": "boolean",
-                "use_external_emojis": "boolean",
-                "add_reactions": "boolean",
-                "attach_files": "boolean",
-                "embed_links": "boolean"
-            }
-        }
-    ]
-}'''
-        
-        prompt = f"""You are a Discord server structure generator. Based on this description: "{description}", create a Discord server structure.
-
-IMPORTANT: You must ONLY return a valid JSON object. Do not include ANY explanatory text, markdown formatting, or code blocks.
-
-Example of CORRECT response format:
-{example_json}
-
-The JSON structure must follow this schema:
-{schema_json}
-
-Rules:
-1. ONLY return the JSON object, nothing else
-2. Use emojis in names (📢, 💬, 🎮, 👑, etc.)
-3. Channel names must be lowercase with hyphens
-4. Maximum: 8 categories, 6 channels per category, 10 roles
-5. All JSON must be valid with proper quotes and commas
-6. All hex colors must be valid (e.g., "#FF0000")
-7. All boolean values must be true or false, not strings
-8. All number values must be actual numbers, not strings
-9. Position values must start from 0 and be sequential
-10. Do not add any fields not specified in the schema"""
-
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        build_log.info("Starting server analysis")
         
-        # Clean up the response
-        if response_text.startswith('```json'):
-            response_text = response_text.replace('```json', '', 1)
-        if response_text.startswith('```'):
-            response_text = response_text.replace('```', '', 1)
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
-        
-        response_text = response_text.strip()
+        prompt = build_server_prompt(description)
+        response_text = await generate_ai_response(prompt)
         
         try:
-            server_plan = json.loads(response_text)
-            
-            # Validate essential structure
-            required_keys = ['server_config', 'categories', 'roles']
-            if not all(key in server_plan for key in required_keys):
-                await bot_channel.send("❌ Invalid server structure: Missing required sections. Please try again.")
-                return
-                
-            # Basic validation of values
-            if not isinstance(server_plan['categories'], list) or not isinstance(server_plan['roles'], list):
-                await bot_channel.send("❌ Invalid server structure: Categories and roles must be lists. Please try again.")
-                return
-                
-            if len(server_plan['categories']) > 8:
-                await bot_channel.send("❌ Too many categories (maximum 8). Please try again.")
-                return
-                
-            if len(server_plan['roles']) > 10:
-                await bot_channel.send("❌ Too many roles (maximum 10). Please try again.")
-                return
-                
-            for category in server_plan['categories']:
-                if len(category.get('channels', [])) > 6:
-                    await bot_channel.send("❌ Too many channels in a category (maximum 6). Please try again.")
-                    return
+            server_plan = parse_server_plan(response_text)
             
             # Store the plan and show confirmation message
-            bot.server_plans = getattr(bot, 'server_plans', {})
-            bot.server_plans[ctx.guild.id] = server_plan
+            bot.server_plans.put(ctx.guild.id, server_plan)
             
             # Show the planned structure
             plan_msg = "Here's the planned server structure:\n\n"
@@ -624,7 +841,17 @@ Rules:
             for role in server_plan['roles']:
                 plan_msg += f"👥 {role['name']}\n"
             
-            plan_msg += "\nReview this structure and type `!confirm` to proceed with creation, or `!cancel` to start over."
+            compiled = plan_permissions(server_plan)
+            stats = compiled['stats']
+            plan_msg += "\n**Permissions**\n"
+            plan_msg += f"{stats['before']} overwrite entries compiled to {stats['after']}; "
+            plan_msg += f"{stats['synced']}/{stats['channels']} channels stay synced with their category\n"
+            for warning in compiled['warnings'][:10]:
+                plan_msg += f"⚠️ {warning}\n"
+            if len(compiled['warnings']) > 10:
+                plan_msg += f"…and {len(compiled['warnings']) - 10} more\n"
+            
+            plan_msg += "\nReview this structure and use `/confirm` to proceed with creation, or `/cancel` to start over."
             
             # Split message if it's too long
             if len(plan_msg) > 2000:
@@ -639,115 +866,256 @@ Rules:
             
             # Interactive changes loop
             while True:
-                await bot_channel.send("✨ Server structure has been created! Would you like to make any additional changes? (yes/no)")
-                
-                def check(m):
-                    return m.author == ctx.author and m.channel == bot_channel and m.content.lower() in ['yes', 'no']
-                
-                try:
-                    msg = await bot.wait_for('message', check=check, timeout=60.0)
-                    if msg.content.lower() == 'no':
-                        break
-                    else:
-                        await bot_channel.send("What additional changes would you like to make? Please describe them:")
-                        try:
-                            changes_msg = await bot.wait_for('message', timeout=60.0, 
-                                check=lambda m: m.author == ctx.author and m.channel == bot_channel)
-                            # Process additional changes here
-                            await bot_channel.send("Processing your changes...")
-                            # [Add your additional changes processing logic]
-                        except asyncio.TimeoutError:
-                            await bot_channel.send("⚠️ No response received. Moving on...")
-                            break
-                except asyncio.TimeoutError:
+                answer = await ask_yes_no(bot_channel, ctx.author,
+                                          "✨ Server structure has been created! Would you like to make any additional changes?",
+                                          timeout=60.0)
+                if answer is None:
+                    await bot_channel.send("⚠️ No response received. Moving on...")
+                    break
+                if not answer:
+                    break
+                changes = await ask_text(bot_channel, ctx.author, "What additional changes would you like to make? Please describe them:",
+                                         "Describe changes", "Additional changes", "Changes")
+                if changes is None:
                     await bot_channel.send("⚠️ No response received. Moving on...")
                     break
+                # Process additional changes here
+                await bot_channel.send("Processing your changes...")
+                # [Add your additional changes processing logic]
             
             # Ask about cleanup
-            await bot_channel.send("🧹 Would you like me to clean up the bot's channel and role? (yes/no)")
-            try:
-                cleanup_msg = await bot.wait_for('message', timeout=30.0, 
-                    check=lambda m: m.author == ctx.author and m.channel == bot_channel and m.content.lower() in ['yes', 'no'])
-                if cleanup_msg.content.lower() == 'yes':
-                    await cleanup_bot_resources(ctx)
-                    await ctx.send("✅ Bot resources have been cleaned up. Enjoy your new server!")
-                else:
-                    await bot_channel.send("✅ Bot resources will be preserved. Enjoy your new server!")
-            except asyncio.TimeoutError:
+            answer = await ask_yes_no(bot_channel, ctx.author, "🧹 Would you like me to clean up the bot's channel and role?")
+            if answer is None:
                 await bot_channel.send("⏳ No response received. Bot resources will be preserved.")
+            elif answer:
+                await cleanup_bot_resources(ctx)
+                await ctx.send("✅ Bot resources have been cleaned up. Enjoy your new server!")
+            else:
+                await bot_channel.send("✅ Bot resources will be preserved. Enjoy your new server!")
             
         except json.JSONDecodeError as e:
             await bot_channel.send(f"❌ Error parsing server structure: Invalid JSON format. Please try again.")
             return
+        except PlanValidationError as e:
+            await bot_channel.send(f"❌ {str(e)} Please try again.")
+            return
         except Exception as e:
             await bot_channel.send(f"❌ Error validating server structure: {str(e)}. Please try again.")
             return
             
     except Exception as e:
+        build_log.exception("build_server failed")
         if bot_channel:
             await bot_channel.send(f"❌ An error occurred: {str(e)}")
         else:
             await ctx.send(f"❌ An error occurred: {str(e)}")
 
-@bot.command(name='confirm')
+@bot.hybrid_command(name='confirm')
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def confirm_build(ctx):
     """Confirm and execute the server build plan"""
     try:
+        await ctx.defer()
         server_plan = bot.server_plans.get(ctx.guild.id)
         if not server_plan:
-            await ctx.send("No pending server build plan found. Use !build_server first!")
+            await ctx.send("No pending server build plan found. Use /build_server first!")
             return
             
         await create_server_structure(ctx, server_plan)
         # Clear the stored plan
-        del bot.server_plans[ctx.guild.id]
+        bot.server_plans.pop(ctx.guild.id)
         
     except Exception as e:
         await ctx.send(f"An error occurred: {str(e)}")
 
-@bot.command(name='cancel')
+@bot.hybrid_command(name='cancel')
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def cancel_build(ctx):
     """Cancel the pending server build"""
     try:
-        if ctx.guild.id in getattr(bot, 'server_plans', {}):
-            del bot.server_plans[ctx.guild.id]
+        if bot.server_plans.pop(ctx.guild.id) is not None:
             await ctx.send("❌ Server build cancelled!")
         else:
             await ctx.send("No pending server build to cancel!")
     except Exception as e:
         await ctx.send(f"An error occurred: {str(e)}")
 
-@bot.command(name='ask')
-async def ask_gemini(ctx, *, question):
+@bot.hybrid_command(name='fleet')
+@commands.is_owner()
+async def fleet_build(ctx, *, guild_ids: str):
+    """Apply this guild's pending build plan to several guilds at once
+    Usage: /fleet <guild_id> <guild_id> ..."""
+    try:
+        await ctx.defer()
+        try:
+            guild_ids = [int(guild_id) for guild_id in guild_ids.replace(',', ' ').split()]
+        except ValueError:
+            await ctx.send("Guild IDs must be numbers separated by spaces.")
+            return
+        server_plan = bot.server_plans.get(ctx.guild.id)
+        if not server_plan:
+            await ctx.send("No pending server build plan found. Use /build_server first!")
+            return
+        if not guild_ids:
+            await ctx.send("Please list the guild IDs to build.")
+            return
+
+        guild_ids = list(dict.fromkeys(guild_ids))
+        
+        # Every listed guild is wiped, so show exactly which ones before starting
+        guilds = [bot.get_guild(guild_id) for guild_id in guild_ids]
+        summary = "**These servers will be wiped and rebuilt:**\n"
+        summary += "\n".join(f"• {guild.name} (`{guild.id}`)" for guild in guilds if guild)
+        unknown = [guild_id for guild_id, guild in zip(guild_ids, guilds) if guild is None]
+        if unknown:
+            summary += "\n\n**Skipped, the bot is not a member:** " + ", ".join(f"`{guild_id}`" for guild_id in unknown)
+        for page in paginate(summary):
+            await ctx.send(page)
+        if len(unknown) == len(guild_ids):
+            return
+        answer = await ask_yes_no(ctx, ctx.author,
+            f"⚠️ Delete every channel and role in {len(guild_ids) - len(unknown)} server(s) and apply the plan?")
+        if not answer:
+            await ctx.send("Fleet build cancelled.")
+            return
+        guild_ids = [guild.id for guild in guilds if guild]
+        
+        progress = FleetProgress(ctx.channel, guild_ids)
+        await progress.start()
+        results = await run_fleet(server_plan, guild_ids, on_status=progress.update)
+        await progress.flush()
+
+        failed = {guild_id: errors for guild_id, errors in results.items() if errors}
+        report = f"✨ Fleet build finished: {len(results) - len(failed)}/{len(results)} guilds built cleanly.\n"
+        for guild_id, errors in failed.items():
+            report += f"\n**{guild_id}**\n" + "\n".join(f"• {error}" for error in errors) + "\n"
+        for i in range(0, len(report), 1900):
+            await ctx.send(report[i:i+1900])
+    except Exception as e:
+        await ctx.send(f"An error occurred: {str(e)}")
+
+def process_rss():
+    """Resident set size of this process in bytes, or None if it can't be read"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+@bot.hybrid_command(name='memory')
+@commands.is_owner()
+async def memory_report(ctx):
+    """Show process memory and cache usage per guild"""
+    guilds = bot.guilds
+    rss = process_rss()
+    sizes = sorted(
+        ((len(g.channels) + len(g.roles) + len(g.members) + len(g.emojis), g) for g in guilds),
+        key=lambda item: item[0], reverse=True
+    )
+    report = f"**Memory report** (cache profile: {CACHE_PROFILE})\n"
+    if rss is not None:
+        report += f"RSS: {rss / 1024 / 1024:.1f} MiB across {len(guilds)} guilds"
+        report += f" ({rss / max(len(guilds), 1) / 1024:.1f} KiB per guild)\n"
+    report += f"Cached: {sum(len(g.channels) for g in guilds)} channels, {sum(len(g.roles) for g in guilds)} roles, "
+    report += f"{sum(len(g.members) for g in guilds)} members, {len(bot.cached_messages)} messages\n"
+    cache = answer_cache.stats()
+    report += f"/ask cache: {cache['entries']} answers in {cache['guilds']} guilds, {cache['hits']} hits / "
+    report += f"{cache['misses']} misses ({cache['hit_rate']:.0%} hit rate), {cache['mean_lookup_ms']:.2f} ms per lookup\n"
+    if sizes:
+        report += "\n**Largest guilds by cached objects**\n"
+        for size, guild in sizes[:5]:
+            report += f"{guild.name} (`{guild.id}`): {size}\n"
+    await ctx.send(report)
+
+def profile_files(profile, name):
+    return [
+        discord.File(io.BytesIO(profile.summary().encode()), filename=f"{name}.txt"),
+        discord.File(io.BytesIO(profile.collapsed().encode()), filename=f"{name}.collapsed"),
+    ]
+
+async def send_profile(ctx, profile):
+    """Send a finished profile to the command's channel, or to its author if that has gone"""
+    name = f"profile-{ctx.command.qualified_name}-{time.strftime('%Y%m%d-%H%M%S')}"
+    content = (f"🔬 Profile of {profile.label}: {profile.wall:.1f}s wall time. "
+               f"`{name}.collapsed` is flamegraph-ready collapsed stacks.")
+    try:
+        await ctx.send(content, files=profile_files(profile, name))
+    except discord.HTTPException:
+        # The bot channel may have been cleaned up or the interaction expired
+        try:
+            await ctx.author.send(content, files=profile_files(profile, name))
+        except discord.HTTPException as e:
+            log.warning("Could not deliver profile: %s", e)
+
+@bot.hybrid_command(name='profile')
+@commands.guild_only()
+@app_commands.guild_only()
+@commands.is_owner()
+async def profile_command(ctx):
+    """Toggle profiling of the next /build_server, /confirm or /ask in this server"""
+    if ctx.guild.id in profile_armed:
+        profile_armed.discard(ctx.guild.id)
+        await ctx.send("Profiling disarmed.")
+    else:
+        profile_armed.add(ctx.guild.id)
+        await ctx.send("🔬 The next /build_server, /confirm or /ask in this server will be profiled "
+                       "(CPU samples, await breakdown and allocations). Run /profile again to disarm.")
+
+@bot.hybrid_command(name='ask')
+async def ask_gemini(ctx, *, question: str):
     """Ask Gemini AI a question"""
     try:
-        response = model.generate_content(question)
-        await ctx.send(response.text)
+        await ctx.defer()
+        cached = answer_cache.lookup(ctx.guild.id, question) if ctx.guild else None
+        if cached:
+            entry, similarity = cached
+            log.info("Answered /ask from cache", extra={'data': {'similarity': round(similarity, 3)}})
+            response = entry.answer + f"\n\n_♻️ Answer to a similar earlier question: \"{entry.question[:100]}\"_"
+        else:
+            response = await generate_ai_response(question)
+            if ctx.guild:
+                answer_cache.store(ctx.guild.id, question, response)
+        for page in paginate(response):
+            await ctx.send(page)
     except Exception as e:
         await ctx.send(f"Sorry, I encountered an error: {str(e)}")
 
-@bot.command(name='help_server')
+@bot.hybrid_command(name='help_server')
 async def help_server(ctx):
     """Display help information about server management commands"""
     help_text = """
 **Server Management Commands:**
-`!build_server <description>` - Design and build a server based on your description
-`!confirm` - Confirm and execute the pending server build plan
-`!cancel` - Cancel the pending server build plan
-`!ask <question>` - Ask Gemini AI a question
-`!help_server` - Show this help message
+`/build_server <description>` - Design and build a server based on your description
+`/confirm` - Confirm and execute the pending server build plan
+`/cancel` - Cancel the pending server build plan
+`/fleet <guild_id> ...` - Apply the pending plan to several guilds at once (bot owner only)
+`/memory` - Show memory and cache usage per guild (bot owner only)
+`/profile` - Profile the next /build_server, /confirm or /ask in this server (bot owner only)
+`/fill_channels <pattern> <description>` - Generate content for every text channel matching a pattern (e.g. `*rules*`)
+`/snapshot` - Save a snapshot of the server structure
+`/snapshots` - List saved snapshots
+`/restore [snapshot_id]` - Rebuild the server from a snapshot (latest by default)
+`/ask <question>` - Ask Gemini AI a question
+`/help_server` - Show this help message
 
 **Examples:**
 1. Gaming Server:
-`!build_server Create a gaming community server focused on Minecraft and other games, with separate areas for different games, voice channels for gaming sessions, role-based access, and community features`
+`/build_server Create a gaming community server focused on Minecraft and other games, with separate areas for different games, voice channels for gaming sessions, role-based access, and community features`
 
 2. Community Server:
-`!build_server Create a vibrant community server with announcement channels, general chat, topic-specific discussions, voice hangouts, and special roles for moderators and active members`
+`/build_server Create a vibrant community server with announcement channels, general chat, topic-specific discussions, voice hangouts, and special roles for moderators and active members`
 
 3. Education Server:
-`!build_server Create an educational server for a programming course with areas for announcements, general discussion, separate topics for different programming languages, homework help, and project collaboration`
+`/build_server Create an educational server for a programming course with areas for announcements, general discussion, separate topics for different programming languages, homework help, and project collaboration`
 
 The bot will create a complete server structure with:
 - Server settings
@@ -756,14 +1124,25 @@ The bot will create a complete server structure with:
 - Roles with permissions
 - Channel-specific permissions
 
-⚠️ **Note**: Using !confirm will delete all existing channels and roles before creating the new structure!
+⚠️ **Note**: Using /confirm will delete all existing channels and roles before creating the new structure! A snapshot is saved first so you can /restore it.
     """
     await ctx.send(help_text)
 
-async def generate_channels(description):
+async def generate_ai_response(prompt):
+    """Generate text for a prompt, falling back across the configured Gemini models"""
+    with span('gemini'):
+        return await ai_model.generate(prompt)
+
+def existing_names_hint(kind, names):
+    """Prompt suffix listing names the model should not generate again"""
+    if not names:
+        return ""
+    return f"\n        These {kind} already exist and must not be repeated: " + ", ".join(names[:100])
+
+async def generate_channels(description, existing=None):
     """Generate channel structure based on description using AI"""
     try:
-        prompt = f"""Generate a Discord channel structure based on this description: {description}
+        prompt = f"""Generate a Discord channel structure based on this description: {description}{existing_names_hint('channels', existing)}
         Return a JSON object with an array of channels. Each channel should have:
         - name: channel name (use emojis where appropriate)
         - type: 'text', 'voice', or 'forum'
@@ -782,7 +1161,7 @@ async def generate_channels(description):
         }}"""
         
         response = await generate_ai_response(prompt)
-        return json.loads(response)
+        return json.loads(clean_model_response(response))
     except Exception as e:
         return {
             'channels': [
@@ -790,10 +1169,10 @@ async def generate_channels(description):
             ]
         }
 
-async def generate_roles(description):
+async def generate_roles(description, existing=None):
     """Generate role structure based on description using AI"""
     try:
-        prompt = f"""Generate Discord roles based on this description: {description}
+        prompt = f"""Generate Discord roles based on this description: {description}{existing_names_hint('roles', existing)}
         Return a JSON object with an array of roles. Each role should have:
         - name: role name
         - color: hex color code
@@ -814,7 +1193,7 @@ async def generate_roles(description):
         }}"""
         
         response = await generate_ai_response(prompt)
-        return json.loads(response)
+        return json.loads(clean_model_response(response))
     except Exception as e:
         return {
             'roles': [
@@ -822,8 +1201,10 @@ async def generate_roles(description):
             ]
         }
 
-async def generate_channel_content(channel_name, description):
-    """Generate formatted content for a channel using AI"""
+async def generate_channel_content(channel_name, description, fallback=True):
+    """Generate formatted content for a channel using AI
+
+    With `fallback` off, AI failures are raised instead of replaced by canned text."""
     try:
         prompt = f"""Generate formatted Discord channel content for a channel named '{channel_name}' based on this description: {description}
         
@@ -854,6 +1235,8 @@ async def generate_channel_content(channel_name, description):
         response = await generate_ai_response(prompt)
         return response
     except Exception as e:
+        if not fallback:
+            raise
         if 'rules' in channel_name.lower():
             return """**Server Rules**\n\n1. Be respectful\n2. No spam\n3. Follow Discord TOS"""
         elif 'info' in channel_name.lower():
@@ -861,91 +1244,333 @@ async def generate_channel_content(channel_name, description):
         else:
             return description
 
+def paginate(text, limit=2000):
+    """Split text into Discord-sized messages, preferring line then word boundaries"""
+    pages = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = text.rfind(' ', 0, limit)
+        if cut <= 0:
+            cut = limit
+        pages.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text:
+        pages.append(text)
+    return pages
+
+async def fill_channels(channels, description, concurrency=CONTENT_CONCURRENCY, limiter=api_limiter):
+    """Generate and post content for many channels at once
+
+    Generation runs up to `concurrency` AI calls in parallel; each page posted
+    draws from the shared API rate limiter. Returns a mapping of channel to
+    None on success or the error message. Nothing is posted to a channel whose
+    content could not be generated."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def fill(channel):
+        try:
+            async with semaphore:
+                # A canned placeholder posted to every selected channel is worse than a reported failure
+                content = await generate_channel_content(channel.name, description, fallback=False)
+            for page in paginate(content):
+                await limiter.acquire()
+                await channel.send(page)
+            results[channel] = None
+        except Exception as e:
+            results[channel] = str(e)
+
+    await asyncio.gather(*(fill(channel) for channel in channels))
+    return results
+
+async def report_fill_results(ctx, results):
+    """Summarise a bulk content run in as few messages as possible"""
+    report = f"✅ Content added to {sum(1 for error in results.values() if error is None)}/{len(results)} channels"
+    for channel, error in results.items():
+        if error is not None:
+            report += f"\n⚠️ #{channel.name}: {error}"
+    for page in paginate(report):
+        await ctx.send(page)
+
+def name_key(name):
+    """Normalise a channel, category or role name so emoji and case variants compare equal"""
+    key = ''.join(ch for ch in name.lower() if ch.isalnum())
+    return key or name.lower().strip()
+
+async def add_channels(guild, new_structure, limiter=api_limiter):
+    """Create generated channels that don't exist yet and return one result line per channel
+
+    Channels go into an existing category with a matching name when there is
+    one, and new categories are created once even if several channels use them.
+    A channel only counts as existing when its type matches too, so a voice
+    channel can share its name with a text channel."""
+    lines = []
+    existing = {(str(c.type), name_key(c.name)) for c in guild.channels if not isinstance(c, discord.CategoryChannel)}
+    categories = {name_key(c.name): c for c in guild.categories}
+    for channel in new_structure.get('channels', []):
+        key = (str(channel.get('type', 'text')).lower(), name_key(channel['name']))
+        if key in existing:
+            lines.append(f"⏭️ Skipped existing channel: {channel['name']}")
+            continue
+        existing.add(key)
+        try:
+            category_name = channel.get('category') or 'General'
+            category = categories.get(name_key(category_name))
+            if not category:
+                await limiter.acquire()
+                category = await guild.create_category(category_name)
+                categories[name_key(category_name)] = category
+                lines.append(f"✅ Created category: {category.name}")
+            await limiter.acquire()
+            # Passing the category's overwrites keeps the new channel synced with it
+            created = await create_plan_channel(category, channel, category.overwrites)
+            if created is None:
+                lines.append(f"⚠️ Unknown channel type for {channel['name']}: {channel['type']}")
+            else:
+                lines.append(f"✅ Created {channel['type']} channel: {channel['name']}")
+        except Exception as e:
+            lines.append(f"⚠️ Error creating channel {channel['name']}: {str(e)}")
+    return lines
+
+async def add_roles(guild, new_structure, limiter=api_limiter):
+    """Create generated roles that don't exist yet and return one result line per role"""
+    lines = []
+    existing = {name_key(r.name) for r in guild.roles}
+    for role in new_structure.get('roles', []):
+        key = name_key(role['name'])
+        if key in existing:
+            lines.append(f"⏭️ Skipped existing role: {role['name']}")
+            continue
+        existing.add(key)
+        try:
+            await limiter.acquire()
+            await guild.create_role(
+                name=role['name'],
+                color=discord.Color.from_str(role['color']),
+                hoist=role['hoist'],
+                mentionable=role['mentionable'],
+                permissions=discord.Permissions(**role['permissions'])
+            )
+            lines.append(f"✅ Created role: {role['name']}")
+        except Exception as e:
+            lines.append(f"⚠️ Error creating role {role['name']}: {str(e)}")
+    return lines
+
+class AddQueue:
+    """Per-guild queue that merges /add channels and /add roles requests
+
+    Requests for a guild that arrive within `window` seconds of the first are
+    generated with one AI call per type, deduplicated against the guild and
+    against each other, and created in a single pass. Batches for the same
+    guild never run at the same time."""
+    def __init__(self, window):
+        self.window = window
+        self.pending = {}
+        self.locks = {}
+        # The loop only keeps weak references to tasks, so hold on to pending flushes
+        self.flushes = set()
+
+    async def submit(self, guild, change_type, description):
+        """Queue a request and return (result lines, batch size) once its batch is applied"""
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.get(guild.id)
+        if batch is None:
+            batch = self.pending[guild.id] = []
+            flush = asyncio.create_task(self.flush_later(guild))
+            self.flushes.add(flush)
+            flush.add_done_callback(self.flushes.discard)
+        else:
+            log.info("Coalescing /add %s request into pending batch", change_type,
+                     extra={'data': {'batch_size': len(batch) + 1}})
+        batch.append((change_type, description, future))
+        return await future
+
+    async def flush_later(self, guild):
+        await asyncio.sleep(self.window)
+        lock = self.locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            batch = self.pending.pop(guild.id, [])
+            try:
+                lines = await self.apply(guild, batch)
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_result((lines, len(batch)))
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+        if guild.id not in self.pending and not lock.locked():
+            self.locks.pop(guild.id, None)
+
+    async def apply(self, guild, batch):
+        lines = []
+        for change_type in ('channels', 'roles'):
+            descriptions = list(dict.fromkeys(desc for kind, desc, _ in batch if kind == change_type))
+            if not descriptions:
+                continue
+            if len(descriptions) == 1:
+                description = descriptions[0]
+            else:
+                description = ("all of these requests combined, without duplicates:\n"
+                               + "\n".join(f"- {desc}" for desc in descriptions))
+            if change_type == 'channels':
+                new_structure = await generate_channels(description, [c.name for c in guild.channels])
+                lines += await add_channels(guild, new_structure)
+            else:
+                new_structure = await generate_roles(description, [r.name for r in guild.roles])
+                lines += await add_roles(guild, new_structure)
+        return lines
+
+# Seconds to wait for more /add requests before generating a guild's batch
+ADD_COALESCE_WINDOW = float(os.getenv('ADD_COALESCE_WINDOW', '3'))
+add_queue = AddQueue(ADD_COALESCE_WINDOW)
+
 async def process_additional_changes(ctx, change_type, description):
     """Process additional changes based on type and description"""
     try:
         if change_type == "channels":
-            new_structure = await generate_channels(description)
+            new_structure = await generate_channels(description, [c.name for c in ctx.guild.channels])
             await ctx.send("🔨 Creating new channels...")
-            for channel in new_structure['channels']:
-                try:
-                    category = None
-                    # Try to find or create category
-                    for existing_category in ctx.guild.categories:
-                        if existing_category.name.lower() == channel['category'].lower():
-                            category = existing_category
-                            break
-                    if not category:
-                        category = await ctx.guild.create_category(channel['category'])
-                        await ctx.send(f"✅ Created category: {category.name}")
-                    
-                    if channel['type'] == 'text':
-                        await category.create_text_channel(
-                            name=channel['name'],
-                            topic=channel['topic']
-                        )
-                    elif channel['type'] == 'voice':
-                        await category.create_voice_channel(name=channel['name'])
-                    elif channel['type'] == 'forum':
-                        await category.create_forum(
-                            name=channel['name'],
-                            topic=channel['topic']
-                        )
-                    await ctx.send(f"✅ Created {channel['type']} channel: {channel['name']}")
-                except Exception as e:
-                    await ctx.send(f"⚠️ Error creating channel {channel['name']}: {str(e)}")
+            for page in paginate("\n".join(await add_channels(ctx.guild, new_structure)) or "Nothing new to add"):
+                await ctx.send(page)
                     
         elif change_type == "roles":
-            new_structure = await generate_roles(description)
+            new_structure = await generate_roles(description, [r.name for r in ctx.guild.roles])
             await ctx.send("🔨 Creating new roles...")
-            for role in new_structure['roles']:
-                try:
-                    await ctx.guild.create_role(
-                        name=role['name'],
-                        color=discord.Color.from_str(role['color']),
-                        hoist=role['hoist'],
-                        mentionable=role['mentionable'],
-                        permissions=discord.Permissions(**role['permissions'])
-                    )
-                    await ctx.send(f"✅ Created role: {role['name']}")
-                except Exception as e:
-                    await ctx.send(f"⚠️ Error creating role {role['name']}: {str(e)}")
+            for page in paginate("\n".join(await add_roles(ctx.guild, new_structure)) or "Nothing new to add"):
+                await ctx.send(page)
                     
         elif change_type == "content":
-            channels = [c for c in ctx.guild.channels if isinstance(c, discord.TextChannel)]
-            channel_list = "\n".join([f"{i+1}. {c.name}" for i, c in enumerate(channels)])
-            await ctx.send(f"Which channel would you like to add content to? (enter the number)\n{channel_list}")
-            
-            try:
-                msg = await bot.wait_for('message', timeout=30.0, 
-                    check=lambda m: m.author == ctx.author and m.channel == ctx.channel and m.content.isdigit() and 1 <= int(m.content) <= len(channels))
-                
-                selected_channel = channels[int(msg.content)-1]
-                content = await generate_channel_content(selected_channel.name, description)
-                await selected_channel.send(content)
-                await ctx.send(f"✅ Added content to #{selected_channel.name}")
-            except asyncio.TimeoutError:
+            selected = await ask_channels(ctx, ctx.author, "Which channel would you like to add content to?")
+            if not selected:
                 await ctx.send("No response received, skipping content addition")
+                return
+            
+            selected_channel = selected[0]
+            content = await generate_channel_content(selected_channel.name, description)
+            for page in paginate(content):
+                await selected_channel.send(page)
+            await ctx.send(f"✅ Added content to #{selected_channel.name}")
                 
     except Exception as e:
         await ctx.send(f"❌ Error processing changes: {str(e)}")
 
-@bot.command(name='add')
+@bot.hybrid_command(name='add')
 @commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
 async def add_server_content(ctx, content_type: str, *, description: str):
     """Add more content to the server
     Usage: 
-    !add channels <description of channels to add>
-    !add roles <description of roles to add>
-    !add content <description of content to add>"""
+    /add channels <description of channels to add>
+    /add roles <description of roles to add>
+    /add content <description of content to add>"""
     
+    await ctx.defer()
     content_type = content_type.lower()
     if content_type not in ['channels', 'roles', 'content']:
         await ctx.send("Invalid content type. Use: channels, roles, or content")
         return
         
     await ctx.send(f"🔨 Processing your request to add {content_type}...")
-    await process_additional_changes(ctx, content_type, description)
+    if content_type == 'content':
+        await process_additional_changes(ctx, content_type, description)
+        return
+    
+    try:
+        lines, batch_size = await add_queue.submit(ctx.guild, content_type, description)
+    except Exception as e:
+        await ctx.send(f"❌ Error processing changes: {str(e)}")
+        return
+    if batch_size > 1:
+        lines.insert(0, f"🧩 Combined with {batch_size - 1} other pending request(s)")
+    for page in paginate("\n".join(lines) or "Nothing new to add"):
+        await ctx.send(page)
+
+@bot.hybrid_command(name='fill_channels')
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def fill_channels_command(ctx, pattern: str, *, description: str):
+    """Generate content for every text channel whose name matches a pattern
+    Usage: /fill_channels <pattern> <description>, e.g. /fill_channels *rules* Strict moderation rules"""
+    await ctx.defer()
+    channels = [c for c in ctx.guild.text_channels if fnmatch.fnmatch(c.name.lower(), pattern.lower())]
+    if not channels:
+        await ctx.send(f"No text channels match `{pattern}`")
+        return
+    await ctx.send(f"✍️ Generating content for {len(channels)} channels...")
+    await report_fill_results(ctx, await fill_channels(channels, description))
+
+@bot.hybrid_command(name='snapshot')
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def snapshot_server(ctx):
+    """Save a snapshot of the current server structure"""
+    try:
+        snapshot_id = await take_snapshot(ctx.guild, 'manual')
+        await ctx.send(f"📸 Saved snapshot `{snapshot_id}`")
+    except Exception as e:
+        await ctx.send(f"❌ Failed to save snapshot: {str(e)}")
+
+@bot.hybrid_command(name='snapshots')
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def list_snapshots(ctx):
+    """List saved snapshots of this server, newest first"""
+    snapshot_ids = snapshot_store.list(ctx.guild.id)
+    if not snapshot_ids:
+        await ctx.send("No snapshots saved for this server yet.")
+        return
+    await ctx.send("**Snapshots** (newest first)\n" + "\n".join(f"`{snapshot_id}`" for snapshot_id in snapshot_ids))
+
+@bot.hybrid_command(name='restore')
+@commands.has_permissions(administrator=True)
+@app_commands.default_permissions(administrator=True)
+async def restore_server(ctx, snapshot_id: Optional[str] = None):
+    """Replace the server structure with a saved snapshot (latest by default)"""
+    try:
+        await ctx.defer()
+        snapshot_ids = snapshot_store.list(ctx.guild.id)
+        if not snapshot_ids:
+            await ctx.send("No snapshots saved for this server yet.")
+            return
+        snapshot_id = snapshot_id or snapshot_ids[0]
+        if snapshot_id not in snapshot_ids:
+            await ctx.send(f"Unknown snapshot `{snapshot_id}`. Use /snapshots to list them.")
+            return
+        
+        # The current channel is about to be deleted, so work from the bot channel
+        bot_channel = await create_bot_channel(ctx)
+        if ctx.channel.id != bot_channel.id:
+            await ctx.send(f"📢 Please use {bot_channel.mention} for bot commands!")
+            return
+        
+        snapshot = await asyncio.to_thread(snapshot_store.load, ctx.guild.id, snapshot_id)
+        answer = await ask_yes_no(ctx, ctx.author,
+            f"⚠️ This deletes every channel and role and restores `{snapshot_id}` "
+            f"({len(snapshot['roles'])} roles, {len(snapshot['channels'])} channels). Continue?")
+        if not answer:
+            await ctx.send("Restore cancelled.")
+            return
+        
+        start_build()
+        await clean_server(ctx, preserve_bot=True)
+        await ctx.send("♻️ Restoring server structure...")
+        errors = []
+        
+        async def record(message):
+            build_log.warning(message)
+            errors.append(message)
+        
+        await restore_guild(ctx.guild, snapshot, api_limiter, record)
+        report = f"✅ Restored snapshot `{snapshot_id}`" + (f" with {len(errors)} error(s)" if errors else "")
+        for error in errors:
+            report += f"\n⚠️ {error}"
+        for page in paginate(report):
+            await ctx.send(page)
+    except Exception as e:
+        await ctx.send(f"❌ Restore failed: {str(e)}")
 
-# Run the bot
-bot.run(os.getenv('DISCORD_TOKEN'))
+# Run the bot (importing this module, e.g. from loadtest.py, only sets it up)
+if __name__ == '__main__':
+    bot.run(os.getenv('DISCORD_TOKEN'), log_handler=None)
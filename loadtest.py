@@ -0,0 +1,468 @@
+"""Soak and concurrency load test for the interactive build flows.
+
+Runs rounds of simulated guild sessions through the real command callbacks in
+bot.py. The sessions run against an in-process fake gateway (guilds, channels,
+roles and the view store) and the offline fake model, so nothing connects to
+Discord or Gemini. Each round mixes sessions that:
+
+    complete   /build_server, then /confirm, answering every prompt
+    cancel     /build_server, then /cancel
+    abandoned  /build_server and never answer or confirm again
+    timed_out  /build_server, then /confirm and stop answering part way
+    ask        /ask, in one of a few shared guilds so cached answers are reused
+
+View timeouts are scaled down (see --timeout-scale) so abandoned prompts expire
+in seconds. After every round the harness waits for the sessions to settle and
+records registered listeners, live views, pending plans, tasks, RSS,
+tracemalloc usage and event-loop lag. It exits with status 1 if anything is
+still registered after a round, if pending plans outlive PLAN_TTL, or if traced
+memory keeps growing after the warm-up rounds.
+
+Usage:
+    python loadtest.py --sessions 200 --rounds 10
+    python loadtest.py --sessions 50 --rounds 3 --model-latency 0.5
+"""
+import os
+import gc
+import sys
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+import discord
+from batch_plans import FakeModel
+from ai_client import ResilientModel
+from views import ConfirmView, ChoiceView, ChannelPickView, TextPromptView
+
+KINDS = ['complete', 'cancel', 'abandoned', 'timed_out', 'ask', 'complete', 'abandoned', 'ask']
+
+ids = itertools.count(10 ** 17)
+
+# /ask sessions share a few guilds so the answer cache fills during warm-up
+# instead of growing toward its cap with one entry per session
+ASK_GUILD_IDS = [next(ids) for _ in range(8)]
+
+class LatencyModel(FakeModel):
+    """FakeModel answering after a random delay averaging `latency` seconds"""
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    async def generate_content_async(self, prompt):
+        await asyncio.sleep(random.uniform(0, 2 * self.latency))
+        return self.generate_content(prompt)
+
+class FakeMessage:
+    def __init__(self, channel, content):
+        self.id = next(ids)
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, **kwargs):
+        self.content = kwargs.get('content', self.content)
+
+    async def delete(self):
+        pass
+
+class FakeRole(discord.Role):
+    """A discord.Role built without connection state, so isinstance checks behave as they do for real roles"""
+    def __init__(self, guild, name, permissions=None, color=None, hoist=False, mentionable=False, default=False):
+        self.id = guild.id if default else next(ids)
+        self.guild = guild
+        self.name = name
+        self._permissions = (permissions or discord.Permissions.none()).value
+        self._colour = (color or discord.Color.default()).value
+        self.hoist = hoist
+        self.mentionable = mentionable
+        self.position = 0 if default else len(guild._roles)
+        self.managed = False
+        self.tags = None
+
+    async def edit(self, **kwargs):
+        for name, value in kwargs.items():
+            if name == 'permissions':
+                self._permissions = value.value
+            elif name in ('color', 'colour'):
+                self._colour = value.value
+            elif name != 'reason':
+                setattr(self, name, value)
+
+    async def delete(self, reason=None):
+        self.guild._roles.remove(self)
+
+class FakeMember:
+    def __init__(self, guild, name):
+        self.id = next(ids)
+        self.guild = guild
+        self.name = name
+        self.roles = [guild.default_role]
+
+    @property
+    def top_role(self):
+        return max(self.roles, key=lambda role: role.position)
+
+    async def add_roles(self, *roles, reason=None):
+        self.roles.extend(roles)
+
+class FakeChannel:
+    def __init__(self, guild, name, channel_type=discord.ChannelType.text, category=None, overwrites=None,
+                 position=None, topic=None, nsfw=False, slowmode_delay=0):
+        self.id = next(ids)
+        self.guild = guild
+        self.name = name
+        self.type = channel_type
+        self.category = category
+        self.overwrites = dict(overwrites or {})
+        self.position = position if isinstance(position, int) else len(guild._channels)
+        self.topic = topic
+        self.nsfw = nsfw
+        self.slowmode_delay = slowmode_delay
+
+    @property
+    def category_id(self):
+        return self.category.id if self.category else None
+
+    @property
+    def permissions_synced(self):
+        return self.category is not None and self.overwrites == self.category.overwrites
+
+    @property
+    def mention(self):
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, view=None, **kwargs):
+        return self.guild.gateway.deliver(self, content, view)
+
+    async def delete(self, reason=None):
+        self.guild._channels.remove(self)
+
+    async def create_text_channel(self, name, **options):
+        return await self.guild.create_text_channel(name, category=self, **options)
+
+    async def create_voice_channel(self, name, **options):
+        return await self.guild.create_voice_channel(name, category=self, **options)
+
+    async def create_forum(self, name, **options):
+        return await self.guild.create_forum(name, category=self, **options)
+
+class FakeGuild:
+    """Just enough of discord.Guild for the build, cleanup and snapshot code paths"""
+    bitrate_limit = 96000.0
+
+    def __init__(self, gateway, session, guild_id=None):
+        self.id = guild_id or next(ids)
+        self.name = f"Load test {self.id}"
+        self.gateway = gateway
+        self.session = session
+        self._roles = []
+        self._channels = []
+        self.default_role = FakeRole(self, "@everyone", default=True)
+        self._roles.append(self.default_role)
+        self.me = FakeMember(self, "Server Builder")
+        self.owner = FakeMember(self, "Owner")
+        self._roles.append(FakeRole(self, "Members"))
+        self._channels.append(FakeChannel(self, "general"))
+        self._channels.append(FakeChannel(self, "bot-commands"))
+
+    # Like discord.py, these return fresh lists so callers can delete while iterating
+    @property
+    def roles(self):
+        return sorted(self._roles, key=lambda role: role.position)
+
+    @property
+    def channels(self):
+        return list(self._channels)
+
+    @property
+    def categories(self):
+        return [channel for channel in self._channels if channel.type == discord.ChannelType.category]
+
+    @property
+    def text_channels(self):
+        return [channel for channel in self._channels if channel.type == discord.ChannelType.text]
+
+    @property
+    def members(self):
+        return [self.me, self.owner]
+
+    @property
+    def emojis(self):
+        return []
+
+    def get_channel(self, channel_id):
+        return discord.utils.get(self._channels, id=channel_id)
+
+    def get_member(self, member_id):
+        return discord.utils.get(self.members, id=member_id)
+
+    async def create_role(self, name, permissions=None, color=None, hoist=False, mentionable=False, reason=None):
+        role = FakeRole(self, name, permissions, color, hoist, mentionable)
+        self._roles.append(role)
+        return role
+
+    async def edit_role_positions(self, positions, reason=None):
+        for role, position in positions.items():
+            role.position = position
+
+    def add_channel(self, name, channel_type, **options):
+        options.pop('reason', None)
+        extra = {key: options.pop(key) for key in list(options) if key not in
+                 ('category', 'overwrites', 'position', 'topic', 'nsfw', 'slowmode_delay')}
+        channel = FakeChannel(self, name, channel_type, **options)
+        for key, value in extra.items():
+            setattr(channel, key, value)
+        self._channels.append(channel)
+        return channel
+
+    async def create_text_channel(self, name, news=False, **options):
+        return self.add_channel(name, discord.ChannelType.news if news else discord.ChannelType.text, **options)
+
+    async def create_voice_channel(self, name, **options):
+        return self.add_channel(name, discord.ChannelType.voice, **options)
+
+    async def create_stage_channel(self, name, **options):
+        return self.add_channel(name, discord.ChannelType.stage_voice, **options)
+
+    async def create_forum(self, name, **options):
+        return self.add_channel(name, discord.ChannelType.forum, **options)
+
+    async def create_category(self, name, **options):
+        return self.add_channel(name, discord.ChannelType.category, **options)
+
+    async def edit(self, **kwargs):
+        self.name = kwargs.get('name', self.name)
+
+class FakeResponse:
+    async def edit_message(self, **kwargs):
+        pass
+
+    async def send_message(self, *args, **kwargs):
+        pass
+
+    async def send_modal(self, modal):
+        pass
+
+class FakeInteraction:
+    def __init__(self, user, guild):
+        self.user = user
+        self.guild = guild
+        self.response = FakeResponse()
+
+class FakeContext:
+    """Stand-in for commands.Context in a guild's bot channel"""
+    def __init__(self, guild, bot):
+        self.guild = guild
+        self.bot = bot
+        self.author = guild.owner
+        self.channel = discord.utils.get(guild.channels, name="bot-commands")
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send(self, content=None, view=None, **kwargs):
+        return await self.channel.send(content, view=view)
+
+class FakeGateway:
+    """Delivers messages and registers views in the bot's real view store, as Messageable.send does"""
+    def __init__(self, bot, timeout_scale, think_time):
+        self.bot = bot
+        self.timeout_scale = timeout_scale
+        self.think_time = think_time
+        self.messages = 0
+        self.answers = set()
+
+    def deliver(self, channel, content, view):
+        self.messages += 1
+        message = FakeMessage(channel, content)
+        if view is not None and not view.is_finished():
+            if view.timeout:
+                view.timeout = view.timeout * self.timeout_scale
+            self.bot._connection.store_view(view, message.id)
+            channel.guild.session.prompted(view)
+        return message
+
+    def answer_later(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.answers.add(task)
+        task.add_done_callback(self.answers.discard)
+
+class Session:
+    """One simulated user driving one guild; `answers` limits how many prompts they answer"""
+    def __init__(self, gateway, kind, answers=None):
+        self.gateway = gateway
+        self.kind = kind
+        self.answers = answers
+        self.guild = FakeGuild(gateway, self, random.choice(ASK_GUILD_IDS) if kind == 'ask' else None)
+
+    def prompted(self, view):
+        if self.answers is not None:
+            if self.answers <= 0:
+                return  # The user has walked away; the view will time out
+            self.answers -= 1
+        self.gateway.answer_later(self.answer(view))
+
+    async def answer(self, view):
+        await asyncio.sleep(random.uniform(0, self.gateway.think_time))
+        if view.is_finished():
+            return
+        if isinstance(view, ConfirmView):
+            value = False
+        elif isinstance(view, ChoiceView):
+            value = len(view.children) - 1  # The last option is always "done"
+        elif isinstance(view, ChannelPickView):
+            value = self.guild.text_channels[:1]
+        elif isinstance(view, TextPromptView):
+            value = "A few more channels for weekly events"
+        else:
+            return
+        await view.finish(FakeInteraction(self.guild.owner, self.guild), value)
+
+    async def run(self, app):
+        ctx = FakeContext(self.guild, app.bot)
+        description = f"A community server for load test guild {self.guild.id}"
+        if self.kind == 'ask':
+            await app.ask_gemini.callback(ctx, question="How do I get a role?")
+            return
+        await app.build_server.callback(ctx, description=description)
+        if self.kind == 'cancel':
+            await app.cancel_build.callback(ctx)
+        elif self.kind == 'complete':
+            await app.confirm_build.callback(ctx)
+        elif self.kind == 'timed_out':
+            self.answers = random.randint(0, 2)
+            await app.confirm_build.callback(ctx)
+
+def view_count(bot):
+    store = bot._connection._view_store
+    return len(store._synced_message_views) + len(store._modals)
+
+def listener_count(bot):
+    return sum(len(listeners) for listeners in bot._listeners.values())
+
+async def measure_lag(samples, interval=0.05):
+    """Record how late the event loop wakes up from a short sleep"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+async def settle(app, gateway, limit):
+    """Wait until every view has finished or timed out, up to `limit` seconds"""
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline and (view_count(app.bot) or gateway.answers):
+        await asyncio.sleep(0.05)
+    # Let on_timeout callbacks and cancelled timeout tasks finish
+    await asyncio.sleep(0.1)
+
+def top_allocators(snapshot, baseline, limit):
+    ignored = (tracemalloc.__file__, __file__)
+    filters = [tracemalloc.Filter(False, path) for path in ignored]
+    stats = snapshot.filter_traces(filters).compare_to(baseline.filter_traces(filters), 'lineno')
+    return [stat for stat in stats if stat.size_diff > 0][:limit]
+
+async def run(app, args):
+    app.ai_model = ResilientModel([('fake', LatencyModel(args.model_latency))], hedge=False)
+    gateway = FakeGateway(app.bot, args.timeout_scale, args.think_time)
+    # The longest prompt timeout in the flows is 120 seconds
+    settle_limit = 120 * args.timeout_scale + args.think_time + 5
+
+    lag = []
+    lag_task = asyncio.create_task(measure_lag(lag))
+    failures = []
+    samples = []
+    baseline = None
+    session_errors = 0
+    print(f"{'round':>5} {'secs':>6} {'views':>5} {'lstn':>4} {'plans':>5} {'tasks':>5} "
+          f"{'rss MiB':>8} {'traced MiB':>10} {'lag p99 ms':>10} {'lag max ms':>10}")
+
+    for round_number in range(1, args.rounds + 1):
+        started = time.monotonic()
+        lag.clear()
+        sessions = [Session(gateway, KINDS[i % len(KINDS)]) for i in range(args.sessions)]
+        results = await asyncio.gather(*(session.run(app) for session in sessions), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        session_errors += len(errors)
+        for error in errors[:3]:
+            print(f"  session error: {error!r}", file=sys.stderr)
+        del sessions, results, errors
+        await settle(app, gateway, settle_limit)
+
+        gc.collect()
+        traced, _ = tracemalloc.get_traced_memory()
+        ordered = sorted(lag) or [0.0]
+        sample = {
+            'views': view_count(app.bot),
+            'listeners': listener_count(app.bot),
+            'plans': len(app.bot.server_plans),
+            'tasks': len(asyncio.all_tasks()) - 2,  # Minus this task and the lag monitor
+            'rss': app.process_rss() or 0,
+            'traced': traced,
+        }
+        samples.append(sample)
+        print(f"{round_number:>5} {time.monotonic() - started:>6.1f} {sample['views']:>5} {sample['listeners']:>4} "
+              f"{sample['plans']:>5} {sample['tasks']:>5} {sample['rss'] / 2**20:>8.1f} {traced / 2**20:>10.2f} "
+              f"{ordered[int(len(ordered) * 0.99)] * 1000:>10.1f} {ordered[-1] * 1000:>10.1f}")
+
+        if sample['views'] or sample['listeners']:
+            failures.append(f"round {round_number}: {sample['views']} views and {sample['listeners']} "
+                            f"listeners still registered after every session ended")
+        if round_number == args.warmup:
+            baseline = tracemalloc.take_snapshot()
+
+    lag_task.cancel()
+
+    # Plans from abandoned sessions must expire, so don't wait out a PLAN_TTL longer than a round
+    waited = min(max(0.0, app.PLAN_TTL - (time.monotonic() - started)), settle_limit) + 0.1
+    await asyncio.sleep(waited)
+    if len(app.bot.server_plans):
+        failures.append(f"{len(app.bot.server_plans)} pending plans still stored {waited:.1f}s after the last "
+                        f"round (PLAN_TTL is {app.PLAN_TTL:g}s)")
+    if session_errors:
+        failures.append(f"{session_errors} sessions raised exceptions")
+
+    if baseline is not None and args.rounds > args.warmup:
+        gc.collect()
+        growth = samples[-1]['traced'] - samples[args.warmup - 1]['traced']
+        print(f"\nTraced memory growth after warm-up: {growth / 1024:.1f} KiB "
+              f"over {args.rounds - args.warmup} rounds (limit {args.max_growth:g} KiB)")
+        print("Top allocators since warm-up:")
+        for stat in top_allocators(tracemalloc.take_snapshot(), baseline, args.top):
+            print(f"  {stat}")
+        if growth > args.max_growth * 1024:
+            failures.append(f"traced memory grew {growth / 1024:.1f} KiB after warm-up")
+
+    print(f"\n{gateway.messages} messages sent across {args.rounds * args.sessions} sessions")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS")
+    return 1 if failures else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test the interactive build flows against a fake gateway")
+    parser.add_argument('--sessions', type=int, default=200, help="Concurrent guild sessions per round")
+    parser.add_argument('--rounds', type=int, default=10, help="Number of rounds to run")
+    parser.add_argument('--warmup', type=int, default=2, help="Rounds before memory growth is measured")
+    parser.add_argument('--timeout-scale', type=float, default=0.02, help="Multiplier applied to every view timeout")
+    parser.add_argument('--think-time', type=float, default=0.2, help="Longest a simulated user takes to answer")
+    parser.add_argument('--model-latency', type=float, default=0.1, help="Mean fake model latency in seconds")
+    parser.add_argument('--plan-ttl', type=float, default=2.0, help="PLAN_TTL for the run, in seconds")
+    parser.add_argument('--max-growth', type=float, default=512, help="Allowed traced memory growth in KiB")
+    parser.add_argument('--top', type=int, default=10, help="Allocators to list")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        # bot.py reads its configuration at import time
+        os.environ['SNAPSHOT_DIR'] = snapshot_dir
+        os.environ['PLAN_TTL'] = str(args.plan_ttl)
+        os.environ.setdefault('LOG_LEVEL', 'ERROR')
+        import bot as app
+        # Started after the import so only allocations made by the sessions are traced
+        tracemalloc.start()
+        return asyncio.run(run(app, args))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Compile the permission sections of a server plan into minimal overwrites.
+
+Plans describe permissions as role_name -> {permission: bool} mappings on
+categories and channels. Creating every channel with its category's overwrites
+plus its own produces large, redundant payloads, and channels drift out of sync
+with their category. compile_permissions() works out what each channel really
+needs:
+
+* aliases (read_messages -> view_channel, ...) are folded into one name
+* entries that cannot change anyone's effective permissions are dropped
+* an override shared by every channel in a category is moved to the category
+* a channel whose overwrites then equal its category's is left synced
+
+Anything dropped or suspicious is reported as a warning instead of being
+silently ignored.
+"""
+
+EVERYONE = '@everyone'
+
+ALIASES = {
+    'read_messages': 'view_channel',
+    'manage_permissions': 'manage_roles',
+    'external_emojis': 'use_external_emojis',
+    'external_stickers': 'use_external_stickers',
+    'use_slash_commands': 'use_application_commands',
+    'manage_emojis': 'manage_emojis_and_stickers',
+}
+
+# Grants that do nothing unless the role can also see the channel
+NEEDS_VIEW = {
+    'send_messages', 'read_message_history', 'add_reactions', 'attach_files', 'embed_links',
+    'mention_everyone', 'manage_messages', 'connect', 'speak', 'stream', 'use_voice_activation',
+    'create_public_threads', 'create_private_threads', 'send_messages_in_threads',
+}
+
+def canonical(name):
+    return ALIASES.get(name, name)
+
+def normalize(perms, where, warnings, valid_names=None):
+    """Fold aliases into canonical names, dropping unknown or contradictory entries"""
+    result = {}
+    for name, value in (perms or {}).items():
+        if value is None:
+            continue
+        if valid_names is not None and name not in valid_names:
+            warnings.append(f"{where}: unknown permission '{name}' ignored")
+            continue
+        if not isinstance(value, bool):
+            warnings.append(f"{where}: '{name}' must be true or false, ignored")
+            continue
+        key = canonical(name)
+        if key in result and result[key] != value:
+            warnings.append(f"{where}: '{name}' contradicts another entry for '{key}', both ignored")
+            result[key] = None
+            continue
+        result[key] = value
+    return {name: value for name, value in result.items() if value is not None}
+
+def minimize(overwrites, role_bases):
+    """Drop overwrite entries that cannot change any member's effective permissions
+
+    Discord applies the @everyone overwrite, then every role overwrite's denies,
+    then every role overwrite's allows. @everyone's own base permissions are not
+    part of the plan, so only entries that are no-ops whatever it grants are
+    removed. Returns the minimal overwrites and a list of
+    (role_name, permission, reason) for every entry dropped."""
+    everyone = overwrites.get(EVERYONE, {})
+    result = {}
+    dropped = []
+    for role_name, perms in overwrites.items():
+        if role_name == EVERYONE:
+            if perms:
+                result[role_name] = dict(perms)
+            continue
+        base = role_bases.get(role_name, set())
+        if 'administrator' in base:
+            for name in perms:
+                dropped.append((role_name, name, f"overwrites for administrator role '{role_name}' have no effect"))
+            continue
+        kept = {}
+        for name, value in perms.items():
+            denied_elsewhere = any(
+                other_perms.get(name) is False
+                for other_name, other_perms in overwrites.items()
+                if other_name not in (role_name, EVERYONE)
+            )
+            if value:
+                already_allowed = everyone.get(name) is True or (name in base and everyone.get(name) is not False)
+                if already_allowed and not denied_elsewhere:
+                    dropped.append((role_name, name, f"'{role_name}' is already allowed '{name}', grant removed"))
+                    continue
+            elif everyone.get(name) is False:
+                dropped.append((role_name, name, f"'{name}' is already denied for everyone, deny for '{role_name}' removed"))
+                continue
+            kept[name] = value
+        if kept:
+            result[role_name] = kept
+    return result, dropped
+
+def report(dropped, where, warnings, only=None):
+    """Add warnings for dropped entries, optionally limited to entries present in `only`"""
+    for role_name, name, reason in dropped:
+        if only is None or name in only.get(role_name, {}):
+            warnings.append(f"{where}: {reason}")
+
+def overlay(base, extra):
+    merged = {role_name: dict(perms) for role_name, perms in base.items()}
+    for role_name, perms in extra.items():
+        merged.setdefault(role_name, {}).update(perms)
+    return merged
+
+def hoist(category_overwrites, channel_overwrites):
+    """Move entries every channel sets identically (and the category doesn't) onto the category"""
+    if len(channel_overwrites) < 2:
+        return category_overwrites
+    first, rest = channel_overwrites[0], channel_overwrites[1:]
+    category_overwrites = overlay(category_overwrites, {})
+    for role_name, perms in first.items():
+        for name, value in perms.items():
+            if category_overwrites.get(role_name, {}).get(name) == value:
+                continue
+            if all(other.get(role_name, {}).get(name) == value for other in rest):
+                category_overwrites.setdefault(role_name, {})[name] = value
+    return category_overwrites
+
+def check_visibility(overwrites, role_bases, where, warnings):
+    """Flag grants that cannot take effect because the role cannot see the channel"""
+    everyone = overwrites.get(EVERYONE, {})
+    for role_name, perms in overwrites.items():
+        if role_name == EVERYONE or 'administrator' in role_bases.get(role_name, set()):
+            continue
+        # A base view_channel permission does not survive an @everyone overwrite deny
+        hidden = perms.get('view_channel') is False or (
+            everyone.get('view_channel') is False and perms.get('view_channel') is not True)
+        granted = sorted(name for name, value in perms.items() if value and name in NEEDS_VIEW)
+        if hidden and granted:
+            warnings.append(f"{where}: '{role_name}' cannot view the channel, so {', '.join(granted)} has no effect")
+
+def count_entries(overwrites):
+    return sum(len(perms) for perms in overwrites.values())
+
+def compile_permissions(server_plan, valid_names=None):
+    """Compile the plan's permissions into minimal category and channel overwrites
+
+    Returns a dict with:
+      categories: one entry per plan category, in order, each with 'overwrites'
+                  and 'channels' (one {'sync': bool, 'overwrites': ...} per channel)
+      warnings:   human readable notes about dropped or ineffective entries
+      stats:      overwrite entry counts before and after compiling"""
+    warnings = []
+    role_names = {role['name'] for role in server_plan.get('roles', [])}
+    role_bases = {}
+    for role in server_plan.get('roles', []):
+        perms = normalize(role.get('permissions'), f"role '{role['name']}'", warnings, valid_names)
+        role_bases[role['name']] = {name for name, value in perms.items() if value}
+
+    def read(section, where):
+        overwrites = {}
+        for role_name, perms in (section or {}).items():
+            if role_name != EVERYONE and role_name not in role_names:
+                warnings.append(f"{where}: role '{role_name}' is not in the plan, overwrite ignored")
+                continue
+            perms = normalize(perms, where, warnings, valid_names)
+            if perms:
+                overwrites[role_name] = perms
+        return overwrites
+
+    compiled = {'categories': [], 'warnings': warnings, 'stats': {'before': 0, 'after': 0, 'synced': 0, 'channels': 0}}
+    stats = compiled['stats']
+    for category in server_plan.get('categories', []):
+        where = f"category '{category['name']}'"
+        category_raw = read(category.get('permissions'), where)
+        channels = category.get('channels', [])
+        channel_raw = [read(channel.get('permissions'), f"channel '{channel['name']}'") for channel in channels]
+
+        # Today every channel is created with its category's overwrites plus its own
+        stats['before'] += count_entries(category_raw)
+        stats['before'] += sum(count_entries(overlay(category_raw, raw)) for raw in channel_raw)
+
+        category_overwrites, dropped = minimize(hoist(category_raw, channel_raw), role_bases)
+        report(dropped, where, warnings, only=category_raw)
+        check_visibility(category_overwrites, role_bases, where, warnings)
+        stats['after'] += count_entries(category_overwrites)
+
+        compiled_channels = []
+        for channel, raw in zip(channels, channel_raw):
+            channel_where = f"channel '{channel['name']}'"
+            effective, dropped = minimize(overlay(category_raw, raw), role_bases)
+            # Inherited entries were already reported on the category
+            report(dropped, channel_where, warnings, only=raw)
+            stats['channels'] += 1
+            if effective == category_overwrites:
+                stats['synced'] += 1
+                compiled_channels.append({'sync': True, 'overwrites': category_overwrites})
+            else:
+                check_visibility(effective, role_bases, channel_where, warnings)
+                stats['after'] += count_entries(effective)
+                compiled_channels.append({'sync': False, 'overwrites': effective})
+        compiled['categories'].append({'overwrites': category_overwrites, 'channels': compiled_channels})
+
+    # Each problem is reported once even when several channels share it
+    compiled['warnings'] = list(dict.fromkeys(warnings))
+    return compiled
@@ -0,0 +1,127 @@
+import json
+
+EXAMPLE_JSON = '{"server_config": {"name": "Gaming Hub","verification_level": 1},"categories": [],"roles": []}'
+SCHEMA_JSON = '''{
+    "server_config": {
+        "name": "string",
+        "verification_level": "number (0-4)",
+        "explicit_content_filter": "number (0-2)",
+        "afk_timeout": "number (60, 300, 900, 1800, 3600)"
+    },
+    "categories": [
+        {
+            "name": "string (with emoji)",
+            "position": "number",
+            "permissions": {
+                "role_name": {
+                    "view_channel": "boolean",
+                    "send_messages": "boolean"
+                }
+            },
+            "channels": [
+                {
+                    "name": "string (with emoji)",
+                    "type": "text/voice/forum",
+                    "topic": "string",
+                    "position": "number",
+                    "slowmode_delay": "number",
+                    "nsfw": "boolean",
+                    "permissions": {}
+                }
+            ]
+        }
+    ],
+    "roles": [
+        {
+            "name": "string (with emoji)",
+            "color": "string (hex color)",
+            "hoist": "boolean",
+            "mentionable": "boolean",
+            "permissions": {
+                "administrator": "boolean",
+                "manage_channels": "boolean",
+                "manage_roles": "boolean",
+                "manage_messages": "boolean",
+                "view_channel": "boolean",
+                "send_messages": "boolean",
+                "read_message_history": "boolean",
+                "connect": "boolean",
+                "speak": "boolean",
+                "use_external_emojis": "boolean",
+                "add_reactions": "boolean",
+                "attach_files": "boolean",
+                "embed_links": "boolean"
+            }
+        }
+    ]
+}'''
+
+MAX_CATEGORIES = 8
+MAX_CHANNELS_PER_CATEGORY = 6
+MAX_ROLES = 10
+
+class PlanValidationError(ValueError):
+    """Raised when a generated server plan does not match the expected structure"""
+
+def build_server_prompt(description):
+    """Build the Gemini prompt that turns a description into a server plan"""
+    return f"""You are a Discord server structure generator. Based on this description: "{description}", create a Discord server structure.
+
+IMPORTANT: You must ONLY return a valid JSON object. Do not include ANY explanatory text, markdown formatting, or code blocks.
+
+Example of CORRECT response format:
+{EXAMPLE_JSON}
+
+The JSON structure must follow this schema:
+{SCHEMA_JSON}
+
+Rules:
+1. ONLY return the JSON object, nothing else
+2. Use emojis in names (📢, 💬, 🎮, 👑, etc.)
+3. Channel names must be lowercase with hyphens
+4. Maximum: {MAX_CATEGORIES} categories, {MAX_CHANNELS_PER_CATEGORY} channels per category, {MAX_ROLES} roles
+5. All JSON must be valid with proper quotes and commas
+6. All hex colors must be valid (e.g., "#FF0000")
+7. All boolean values must be true or false, not strings
+8. All number values must be actual numbers, not strings
+9. Position values must start from 0 and be sequential
+10. Do not add any fields not specified in the schema"""
+
+def clean_model_response(response_text):
+    """Strip the markdown code fences models like to wrap JSON in"""
+    response_text = response_text.strip()
+    if response_text.startswith('```json'):
+        response_text = response_text.replace('```json', '', 1)
+    if response_text.startswith('```'):
+        response_text = response_text.replace('```', '', 1)
+    if response_text.endswith('```'):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+def validate_server_plan(server_plan):
+    """Check a decoded plan against the structure and limits build_server relies on"""
+    required_keys = ['server_config', 'categories', 'roles']
+    if not isinstance(server_plan, dict) or not all(key in server_plan for key in required_keys):
+        raise PlanValidationError("Invalid server structure: Missing required sections.")
+
+    if not isinstance(server_plan['categories'], list) or not isinstance(server_plan['roles'], list):
+        raise PlanValidationError("Invalid server structure: Categories and roles must be lists.")
+
+    if len(server_plan['categories']) > MAX_CATEGORIES:
+        raise PlanValidationError(f"Too many categories (maximum {MAX_CATEGORIES}).")
+
+    if len(server_plan['roles']) > MAX_ROLES:
+        raise PlanValidationError(f"Too many roles (maximum {MAX_ROLES}).")
+
+    for category in server_plan['categories']:
+        if len(category.get('channels', [])) > MAX_CHANNELS_PER_CATEGORY:
+            raise PlanValidationError(f"Too many channels in a category (maximum {MAX_CHANNELS_PER_CATEGORY}).")
+
+    return server_plan
+
+def parse_server_plan(response_text):
+    """Decode and validate a raw model response
+
+    Raises json.JSONDecodeError for malformed JSON and PlanValidationError
+    for JSON that does not describe a usable plan."""
+    return validate_server_plan(json.loads(clean_model_response(response_text)))
@@ -0,0 +1,151 @@
+"""One-off profiles of a single command, armed on demand.
+
+A Profile samples the event loop thread's Python stack every few milliseconds
+from a background thread. The samples are written as collapsed stacks that
+flamegraph.pl, speedscope or inferno read directly. Awaits wrapped in span()
+add up per category (Gemini, rate limiter, pacing sleeps, Discord API,
+waiting for the user), and tracemalloc records what was allocated while the
+command ran.
+
+Nothing runs until a profile is started. When none is active, span() only
+checks a context variable.
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter
+
+# The profile of the command running in this context, if any
+active = contextvars.ContextVar('profile', default=None)
+
+# Only one sampler thread runs at a time
+current = None
+
+class span:
+    """Time an await under `name` when the surrounding command is being profiled
+
+        with span('gemini'):
+            response = await model.generate(prompt)"""
+    __slots__ = ('name', 'profile', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.profile = active.get()
+        if self.profile is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.record(self.name, time.perf_counter() - self.started)
+
+def frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+class StackSampler(threading.Thread):
+    """Counts the collapsed Python stack of one thread every `interval` seconds"""
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+class Profile:
+    """CPU samples, await spans and allocations for one command"""
+    def __init__(self, label, interval=0.005, trace_memory=True):
+        self.label = label
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.spans = {}
+        self.sampler = None
+        self.started_tracing = False
+        self.baseline = None
+        self.allocations = []
+
+    def start(self):
+        """Start sampling the calling (event loop) thread and make this the active profile"""
+        global current
+        current = self
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            self.baseline = tracemalloc.take_snapshot()
+        self.sampler = StackSampler(threading.get_ident(), self.interval)
+        self.sampler.start()
+        active.set(self)
+
+    def record(self, name, seconds):
+        count, total, longest = self.spans.get(name, (0, 0.0, 0.0))
+        self.spans[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    def stop(self):
+        global current
+        if self.sampler.stopping.is_set():
+            return
+        self.sampler.stop()
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+        if self.baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            self.allocations = [stat for stat in snapshot.compare_to(self.baseline, 'lineno') if stat.size_diff > 0]
+            self.baseline = None
+            if self.started_tracing:
+                tracemalloc.stop()
+        if current is self:
+            current = None
+
+    def collapsed(self):
+        """Samples in collapsed-stack format: `frame;frame;frame count` per line"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.sampler.stacks.most_common())
+
+    def summary(self, limit=20):
+        samples = sum(self.sampler.stacks.values())
+        leaves = Counter()
+        for stack, count in self.sampler.stacks.items():
+            leaves[stack.rpartition(';')[2]] += count
+
+        lines = [f"Profile of {self.label}",
+                 f"Wall time {self.wall:.2f}s, process CPU time {self.cpu:.2f}s, "
+                 f"{samples} stack samples every {self.interval * 1000:g} ms", ""]
+        lines.append("Await breakdown (spans can overlap when work runs concurrently)")
+        lines.append(f"  {'span':<14} {'count':>6} {'total s':>9} {'% wall':>7} {'mean ms':>9} {'max ms':>9}")
+        for name, (count, total, longest) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {name:<14} {count:>6} {total:>9.2f} {total / max(self.wall, 1e-9) * 100:>6.1f}% "
+                         f"{total / count * 1000:>9.1f} {longest * 1000:>9.1f}")
+        if not self.spans:
+            lines.append("  (no spans recorded)")
+
+        lines += ["", "Top frames by samples on the event loop thread (idle time shows up as the selector)"]
+        for frame, count in leaves.most_common(limit):
+            lines.append(f"  {count / max(samples, 1) * 100:>5.1f}%  {frame}")
+
+        if self.trace_memory:
+            lines += ["", "Top allocations while the command ran"]
+            for stat in self.allocations[:limit]:
+                lines.append(f"  {stat}")
+            if not self.allocations:
+                lines.append("  (nothing retained)")
+        return "\n".join(lines) + "\n"
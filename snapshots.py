@@ -0,0 +1,220 @@
+"""Point-in-time structure snapshots of a guild and parallel restore.
+
+A snapshot records roles, categories, channels, their settings, ordering and
+permission overwrites as compact gzipped JSON. It does not record messages or
+members. Restoring recreates everything concurrently. Each API call is paced by
+the caller's rate limiter, and role IDs in overwrites are remapped to the newly
+created roles.
+"""
+import os
+import gzip
+import json
+import asyncio
+from datetime import datetime, timezone
+import discord
+
+SNAPSHOT_VERSION = 1
+
+def is_role(target):
+    # Overwrites for uncached roles come back as discord.Object(type=discord.Role)
+    return isinstance(target, discord.Role) or getattr(target, 'type', None) is discord.Role
+
+def capture_overwrites(channel):
+    return [
+        {
+            'id': target.id,
+            'type': 'role' if is_role(target) else 'member',
+            'allow': allow.value,
+            'deny': deny.value,
+        }
+        for target, overwrite in channel.overwrites.items()
+        for allow, deny in [overwrite.pair()]
+    ]
+
+def capture_guild(guild, reason='manual'):
+    """Record the structure of a guild as a JSON-serialisable dict"""
+    channels = []
+    for channel in guild.channels:
+        data = {
+            'id': channel.id,
+            'name': channel.name,
+            'type': str(channel.type),
+            'position': channel.position,
+            'category_id': channel.category_id,
+            'synced': channel.category is not None and channel.permissions_synced,
+            'overwrites': capture_overwrites(channel),
+        }
+        for attribute in ('topic', 'nsfw', 'slowmode_delay', 'bitrate', 'user_limit'):
+            value = getattr(channel, attribute, None)
+            if value is not None:
+                data[attribute] = value
+        channels.append(data)
+
+    return {
+        'version': SNAPSHOT_VERSION,
+        'guild_id': guild.id,
+        'guild_name': guild.name,
+        'taken_at': datetime.now(timezone.utc).isoformat(),
+        'reason': reason,
+        'roles': [
+            {
+                'id': role.id,
+                'name': role.name,
+                'permissions': role.permissions.value,
+                'color': role.color.value,
+                'hoist': role.hoist,
+                'mentionable': role.mentionable,
+                'position': role.position,
+                'default': role.is_default(),
+                'managed': role.managed,
+            }
+            for role in guild.roles
+        ],
+        'channels': channels,
+    }
+
+class SnapshotStore:
+    """Gzipped JSON snapshots on disk, keeping the newest `retention` per guild"""
+    def __init__(self, directory, retention=10):
+        self.directory = directory
+        self.retention = retention
+
+    def guild_dir(self, guild_id):
+        return os.path.join(self.directory, str(guild_id))
+
+    def save(self, snapshot):
+        """Write a snapshot, prune old ones and return the new snapshot's ID"""
+        directory = self.guild_dir(snapshot['guild_id'])
+        os.makedirs(directory, exist_ok=True)
+        taken_at = datetime.fromisoformat(snapshot['taken_at'])
+        snapshot_id = f"{taken_at.strftime('%Y%m%dT%H%M%S%f')}-{snapshot['reason']}"
+        path = os.path.join(directory, snapshot_id + '.json.gz')
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+        self.prune(snapshot['guild_id'])
+        return snapshot_id
+
+    def list(self, guild_id):
+        """Snapshot IDs for a guild, newest first"""
+        directory = self.guild_dir(guild_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted((name[:-len('.json.gz')] for name in os.listdir(directory) if name.endswith('.json.gz')),
+                      reverse=True)
+
+    def load(self, guild_id, snapshot_id):
+        path = os.path.join(self.guild_dir(guild_id), os.path.basename(snapshot_id) + '.json.gz')
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def prune(self, guild_id):
+        for snapshot_id in self.list(guild_id)[self.retention:]:
+            os.remove(os.path.join(self.guild_dir(guild_id), snapshot_id + '.json.gz'))
+
+def build_snapshot_overwrites(guild, overwrites, role_map):
+    """Turn captured overwrites into discord overwrites using the old -> new role mapping"""
+    result = {}
+    for data in overwrites:
+        if data['type'] == 'role':
+            target = role_map.get(data['id'])
+        else:
+            target = guild.get_member(data['id']) or discord.Object(id=data['id'])
+        if target is None:
+            continue
+        result[target] = discord.PermissionOverwrite.from_pair(
+            discord.Permissions(data['allow']), discord.Permissions(data['deny']))
+    return result
+
+async def restore_guild(guild, snapshot, limiter, on_error):
+    """Recreate a snapshot's roles, categories and channels in an emptied guild
+
+    Roles are created first, then all categories in parallel, then all channels
+    in parallel, with every call waiting on `limiter`. Roles and channels that
+    still exist (managed roles, the bot channel) are reused rather than duplicated."""
+    role_map = {}
+    existing_roles = {role.id: role for role in guild.roles}
+    for data in snapshot['roles']:
+        if data['id'] in existing_roles and (data['default'] or data['managed'] or existing_roles[data['id']].name == data['name']):
+            role_map[data['id']] = existing_roles[data['id']]
+
+    async def create_role(data):
+        try:
+            await limiter.acquire()
+            role_map[data['id']] = await guild.create_role(
+                name=data['name'],
+                permissions=discord.Permissions(data['permissions']),
+                color=discord.Color(data['color']),
+                hoist=data['hoist'],
+                mentionable=data['mentionable'],
+                reason="Snapshot restore"
+            )
+        except Exception as e:
+            await on_error(f"Error restoring role {data['name']}: {str(e)}")
+
+    missing_roles = [data for data in snapshot['roles'] if data['id'] not in role_map and not data['managed']]
+    await asyncio.gather(*(create_role(data) for data in missing_roles))
+
+    for data in snapshot['roles']:
+        if data['default']:
+            try:
+                await limiter.acquire()
+                await guild.default_role.edit(permissions=discord.Permissions(data['permissions']))
+            except Exception as e:
+                await on_error(f"Error restoring @everyone permissions: {str(e)}")
+
+    # Roles were created concurrently, so put them back in their original order
+    ordered = sorted((data for data in missing_roles if data['id'] in role_map), key=lambda data: data['position'])
+    if ordered:
+        try:
+            top = guild.me.top_role.position
+            positions = {role_map[data['id']]: max(1, top - len(ordered) + index) for index, data in enumerate(ordered)}
+            await limiter.acquire()
+            await guild.edit_role_positions(positions=positions)
+        except Exception as e:
+            await on_error(f"Error restoring role order: {str(e)}")
+
+    existing_channels = {channel.name for channel in guild.channels}
+    channel_map = {}
+
+    async def create_channel(data, category=None):
+        if data['name'] in existing_channels:
+            return
+        try:
+            if data['synced'] and category is not None:
+                overwrites = category.overwrites
+            else:
+                overwrites = build_snapshot_overwrites(guild, data['overwrites'], role_map)
+            options = {'name': data['name'], 'overwrites': overwrites, 'position': data['position'],
+                       'reason': "Snapshot restore"}
+            channel_type = data['type']
+            await limiter.acquire()
+            if channel_type == 'category':
+                channel_map[data['id']] = await guild.create_category(**options)
+            elif channel_type in ('text', 'news'):
+                await guild.create_text_channel(category=category, news=channel_type == 'news',
+                                                topic=data.get('topic'), nsfw=data.get('nsfw', False),
+                                                slowmode_delay=data.get('slowmode_delay', 0), **options)
+            elif channel_type in ('voice', 'stage_voice'):
+                create = guild.create_voice_channel if channel_type == 'voice' else guild.create_stage_channel
+                await create(category=category, bitrate=min(data.get('bitrate', 64000), int(guild.bitrate_limit)),
+                             user_limit=data.get('user_limit', 0), **options)
+            elif channel_type == 'forum':
+                await guild.create_forum(category=category, topic=data.get('topic'), nsfw=data.get('nsfw', False),
+                                         slowmode_delay=data.get('slowmode_delay', 0), **options)
+            else:
+                await on_error(f"Skipped {channel_type} channel {data['name']}: type cannot be restored")
+        except Exception as e:
+            await on_error(f"Error restoring channel {data['name']}: {str(e)}")
+
+    categories = [data for data in snapshot['channels'] if data['type'] == 'category']
+    await asyncio.gather(*(create_channel(data) for data in categories))
+    for category in guild.categories:
+        # Reuse categories that survived (e.g. the bot channel's) for their children
+        for data in categories:
+            if data['name'] == category.name and data['id'] not in channel_map:
+                channel_map[data['id']] = category
+
+    channels = [data for data in snapshot['channels'] if data['type'] != 'category']
+    await asyncio.gather(*(create_channel(data, channel_map.get(data['category_id'])) for data in channels))
+    return True
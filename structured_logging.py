@@ -0,0 +1,147 @@
+"""Structured JSON logging that never blocks the event loop.
+
+Records are queued by a QueueHandler and written by a QueueListener on a
+background thread. Each record carries the build, guild and command correlation
+IDs from the context variables below. asyncio copies context into tasks, so
+every log line from a command or build, and from tasks it spawns, can be
+correlated afterwards.
+
+Configuration (environment):
+    LOG_LEVEL      root level, default INFO
+    LOG_LEVELS     per-subsystem levels, e.g. "ai_client=DEBUG,discord=WARNING"
+    LOG_SAMPLING   per-subsystem sampling of records below WARNING, e.g. "ai_client=0.1"
+    LOG_QUEUE_SIZE records buffered before new ones are dropped, default 10000
+"""
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+build_id = contextvars.ContextVar('build_id', default=None)
+guild_id = contextvars.ContextVar('guild_id', default=None)
+command_id = contextvars.ContextVar('command_id', default=None)
+command_name = contextvars.ContextVar('command_name', default=None)
+
+def new_id():
+    return uuid.uuid4().hex[:12]
+
+def start_build():
+    """Give the current context (and tasks it creates) a fresh build ID"""
+    value = new_id()
+    build_id.set(value)
+    return value
+
+def parse_mapping(value):
+    """Parse "name=value,name=value" into a dict"""
+    result = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, setting = item.split('=', 1)
+            result[name.strip()] = setting.strip()
+    return result
+
+def subsystem_setting(settings, logger_name):
+    """Most specific setting for a logger, so "bot=..." also covers "bot.build" """
+    name = logger_name
+    while name:
+        if name in settings:
+            return settings[name]
+        name = name.rpartition('.')[0]
+    return None
+
+class ContextFilter(logging.Filter):
+    """Copy correlation IDs onto the record in the thread that logged it"""
+    def filter(self, record):
+        record.build_id = build_id.get()
+        record.guild_id = guild_id.get()
+        record.command_id = command_id.get()
+        record.command = command_name.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of a subsystem's records below WARNING"""
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = subsystem_setting(self.rates, record.name)
+        return rate is None or random.random() < rate
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when the queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now, but keep them as separate fields
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key in ('build_id', 'guild_id', 'command_id', 'command'):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        extra = getattr(record, 'data', None)
+        if extra:
+            entry.update(extra)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def setup_logging(stream=None):
+    """Route all logging through a background-thread JSON writer and return the handler
+
+    Pass structured fields with `logger.info("...", extra={'data': {...}})`."""
+    root = logging.getLogger()
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    for name, level in parse_mapping(os.getenv('LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter({name: float(rate) for name, rate in parse_mapping(os.getenv('LOG_SAMPLING')).items()}))
+    handler.addFilter(ContextFilter())
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    return handler
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from ai_client import ResilientModel, CircuitBreaker, GenerationError
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class ScriptedModel:
+    """Answers each call after the next delay in `delays`; None raises instead"""
+    def __init__(self, delays, text='ok'):
+        self.delays = list(delays)
+        self.text = text
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        if delay is None:
+            raise RuntimeError("model error")
+        await asyncio.sleep(delay)
+        return Response(self.text)
+
+def generate(model, prompt='prompt'):
+    return asyncio.run(model.generate(prompt))
+
+def test_hedge_wins_when_first_request_is_slow():
+    # The first call hangs; the hedge fired after hedge_delay answers quickly
+    primary = ScriptedModel([5.0, 0.01])
+    model = ResilientModel([('primary', primary)], timeout=1.0, hedge_delay=0.05)
+    assert generate(model) == 'ok'
+    assert primary.calls == 2 and model.hedges_sent == 1
+
+def test_no_hedge_when_first_request_is_fast():
+    primary = ScriptedModel([0.01])
+    model = ResilientModel([('primary', primary)], timeout=1.0, hedge_delay=0.5)
+    assert generate(model) == 'ok'
+    assert primary.calls == 1 and model.hedges_sent == 0
+
+def test_hedge_delay_follows_observed_latency():
+    model = ResilientModel([('primary', ScriptedModel([0.0]))], hedge_delay=2.0, hedge_min_delay=0.25, min_samples=5)
+    endpoint = model.endpoints[0]
+    assert model.hedge_delay_for(endpoint) == 2.0
+    endpoint.latencies.extend([0.5, 0.6, 0.7, 0.8, 1.0])
+    assert model.hedge_delay_for(endpoint) == 1.0
+    endpoint.latencies.clear()
+    endpoint.latencies.extend([0.01] * 5)
+    assert model.hedge_delay_for(endpoint) == 0.25
+
+@pytest.mark.parametrize("primary_delays", [[None], [5.0]])
+def test_falls_back_on_error_or_timeout(primary_delays):
+    primary, fallback = ScriptedModel(primary_delays), ScriptedModel([0.0], text='fallback')
+    model = ResilientModel([('primary', primary), ('fallback', fallback)], timeout=0.1, hedge=False)
+    assert generate(model) == 'fallback'
+
+def test_all_models_failing_raises():
+    model = ResilientModel([('a', ScriptedModel([None])), ('b', ScriptedModel([None]))], hedge=False)
+    with pytest.raises(GenerationError):
+        generate(model)
+
+def test_open_breaker_skips_model():
+    primary, fallback = ScriptedModel([None]), ScriptedModel([0.0], text='fallback')
+    model = ResilientModel([('primary', primary), ('fallback', fallback)], hedge=False,
+                           breaker_threshold=2, breaker_cooldown=60)
+    for _ in range(3):
+        assert generate(model) == 'fallback'
+    assert primary.calls == 2
+    assert model.status()['primary']['state'] == 'open'
+
+def test_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == 'half-open'
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+def test_cancelled_trial_releases_half_open_breaker():
+    primary = ScriptedModel([5.0, 0.0])
+    model = ResilientModel([('primary', primary)], hedge=False, breaker_threshold=1, breaker_cooldown=0)
+    breaker = model.endpoints[0].breaker
+    breaker.record_failure()
+    assert breaker.state == 'half-open'
+
+    async def cancel_trial():
+        task = asyncio.create_task(model.generate('prompt'))
+        await asyncio.sleep(0.05)
+        assert breaker.trial_in_flight
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_trial())
+    assert breaker.state == 'half-open' and not breaker.trial_in_flight
+    assert generate(model) == 'ok'
+    assert breaker.state == 'closed'
@@ -0,0 +1,65 @@
+import pytest
+import answer_cache
+from answer_cache import AnswerCache, terms
+
+@pytest.mark.parametrize("question, expected", [
+    ("How do I get roles?", {'how': 1, 'get': 1, 'role': 1}),
+    ("how to get a role", {'how': 1, 'get': 1, 'role': 1}),
+    ("Channels, channels!", {'channel': 2}),
+    ("how do I?", {'how': 1}),
+])
+def test_terms(question, expected):
+    assert terms(question) == expected
+
+@pytest.mark.parametrize("stored, question, hit", [
+    ("How do I get roles?", "how to get a role", True),
+    ("How do I get roles?", "HOW DO I GET ROLES", True),
+    ("How do I get roles?", "how do I delete roles", False),
+    ("What is the best minecraft server?", "what is minecraft", False),
+    ("How do I get roles?", "", False),
+])
+def test_lookup_threshold(stored, question, hit):
+    cache = AnswerCache(threshold=0.8)
+    cache.store(1, stored, "answer")
+    assert (cache.lookup(1, question) is not None) == hit
+
+def test_guilds_are_isolated():
+    cache = AnswerCache()
+    cache.store(1, "How do I get roles?", "answer")
+    assert cache.lookup(2, "How do I get roles?") is None
+    entry, similarity = cache.lookup(1, "How do I get roles?")
+    assert entry.answer == "answer" and similarity == pytest.approx(1.0)
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, 'monotonic', lambda: now[0])
+    cache = AnswerCache(ttl=60)
+    cache.store(1, "How do I get roles?", "answer")
+    now[0] += 61
+    assert cache.lookup(1, "How do I get roles?") is None
+    assert len(cache) == 0 and cache.indexes == {}
+
+def test_lru_eviction_across_guilds():
+    cache = AnswerCache(max_entries=2)
+    cache.store(1, "How do I get roles?", "roles")
+    cache.store(2, "Where are the rules?", "rules")
+    # Using the first entry makes the second the least recently used
+    assert cache.lookup(1, "how to get a role")
+    cache.store(1, "How do I make a channel?", "channel")
+    assert len(cache) == 2
+    assert cache.lookup(2, "Where are the rules?") is None
+    assert cache.lookup(1, "How do I get roles?")
+
+def test_stats():
+    cache = AnswerCache()
+    cache.store(1, "How do I get roles?", "answer")
+    cache.lookup(1, "how to get a role")
+    cache.lookup(1, "what is the server about")
+    stats = cache.stats()
+    assert (stats['entries'], stats['guilds'], stats['hits'], stats['misses']) == (1, 1, 1, 1)
+    assert stats['hit_rate'] == 0.5
+
+def test_disabled_when_size_is_zero():
+    cache = AnswerCache(max_entries=0)
+    cache.store(1, "How do I get roles?", "answer")
+    assert len(cache) == 0
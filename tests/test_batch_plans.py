@@ -0,0 +1,99 @@
+import json
+import asyncio
+import pytest
+from ai_client import ResilientModel
+from batch_plans import FakeModel, run_batch
+
+class CountingModel(FakeModel):
+    def __init__(self, failure_rate=0.0):
+        super().__init__(failure_rate)
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        return super().generate_content(prompt)
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / 'descriptions.jsonl', tmp_path / 'plans.jsonl', tmp_path / 'plans.errors.jsonl'
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+def item(item_id, description='A gaming community'):
+    return json.dumps({'id': item_id, 'description': description})
+
+def batch(paths, failure_rate=0.0, retries=0):
+    model = CountingModel(failure_rate)
+    resilient = ResilientModel([('fake', model)], hedge=False, breaker_threshold=100)
+    counts = asyncio.run(run_batch(resilient, *map(str, paths), concurrency=2, retries=retries, backoff=0))
+    return counts, model
+
+def test_generates_every_item(paths):
+    write_lines(paths[0], [item('a'), item('b'), json.dumps({'description': 'No id'})])
+    counts, _ = batch(paths)
+    assert counts == (3, 0, 0)
+    assert sorted(record['id'] for record in read_records(paths[1])) == ['3', 'a', 'b']
+    assert all(record['plan']['categories'] for record in read_records(paths[1]))
+
+def test_skips_ids_already_written(paths):
+    write_lines(paths[0], [item('a'), item('b')])
+    batch(paths)
+    counts, model = batch(paths)
+    assert counts == (0, 0, 2)
+    assert model.calls == 0
+    assert len(read_records(paths[1])) == 2
+
+def test_resumes_after_torn_final_line(paths):
+    write_lines(paths[0], [item('a'), item('b')])
+    batch(paths)
+    first, second = paths[1].read_text(encoding='utf-8').splitlines()
+    # Interrupted while writing the second record
+    paths[1].write_text(first + '\n' + second[:len(second) // 2], encoding='utf-8')
+    counts, _ = batch(paths)
+    assert counts == (1, 0, 1)
+    assert sorted(record['id'] for record in read_records(paths[1])) == ['a', 'b']
+
+def test_keeps_complete_final_record_without_newline(paths):
+    write_lines(paths[0], [item('a'), item('b')])
+    batch(paths)
+    paths[1].write_text(paths[1].read_text(encoding='utf-8').rstrip('\n'), encoding='utf-8')
+    write_lines(paths[0], [item('a'), item('b'), item('c')])
+    counts, _ = batch(paths)
+    assert counts == (1, 0, 2)
+    assert sorted(record['id'] for record in read_records(paths[1])) == ['a', 'b', 'c']
+
+@pytest.mark.parametrize("bad_line", [
+    'not json',
+    '["a", "list"]',
+    json.dumps({'id': 'x'}),
+    json.dumps({'id': 'x', 'description': '  '}),
+])
+def test_malformed_lines_are_reported_and_skipped(paths, bad_line):
+    write_lines(paths[0], [item('a'), bad_line, item('b')])
+    counts, _ = batch(paths)
+    assert counts == (2, 1, 0)
+    assert sorted(record['id'] for record in read_records(paths[1])) == ['a', 'b']
+    [error] = read_records(paths[2])
+    assert error['id'] is None and error['line'] == 2
+
+@pytest.mark.parametrize("retries", [0, 2])
+def test_retries_are_bounded(paths, retries):
+    write_lines(paths[0], [item('a')])
+    counts, model = batch(paths, failure_rate=1.0, retries=retries)
+    assert counts == (0, 1, 0)
+    assert model.calls == retries + 1
+    [error] = read_records(paths[2])
+    assert error['id'] == 'a'
+
+def test_errors_file_only_lists_what_is_still_failing(paths):
+    write_lines(paths[0], [item('a'), 'not json', item('b')])
+    batch(paths, failure_rate=1.0)
+    batch(paths, failure_rate=1.0)
+    errors = read_records(paths[2])
+    assert sorted(str(error['id']) for error in errors) == ['None', 'a', 'b']
+    batch(paths)
+    assert [(error['id'], error['line']) for error in read_records(paths[2])] == [(None, 2)]
@@ -0,0 +1,110 @@
+import pytest
+from permission_compiler import EVERYONE, normalize, minimize, hoist, compile_permissions
+
+@pytest.mark.parametrize("perms, expected, warning", [
+    ({'read_messages': True}, {'view_channel': True}, None),
+    ({'read_messages': True, 'view_channel': True}, {'view_channel': True}, None),
+    ({'read_messages': True, 'view_channel': False}, {}, "contradicts"),
+    ({'send_messages': 'yes'}, {}, "must be true or false"),
+    ({'fly': True}, {}, "unknown permission"),
+    ({'send_messages': None}, {}, None),
+])
+def test_normalize(perms, expected, warning):
+    warnings = []
+    assert normalize(perms, "channel 'x'", warnings, {'view_channel', 'read_messages', 'send_messages'}) == expected
+    if warning:
+        assert len(warnings) == 1 and warning in warnings[0]
+    else:
+        assert warnings == []
+
+@pytest.mark.parametrize("overwrites, role_bases, expected, dropped", [
+    # A grant the role already has from its base permissions is a no-op
+    ({'Mod': {'send_messages': True}}, {'Mod': {'send_messages'}}, {}, [('Mod', 'send_messages')]),
+    # ...unless another role's deny would otherwise win for members holding both
+    ({'Mod': {'send_messages': True}, 'Muted': {'send_messages': False}}, {'Mod': {'send_messages'}},
+     {'Mod': {'send_messages': True}, 'Muted': {'send_messages': False}}, []),
+    # An @everyone allow makes the same role allow redundant
+    ({EVERYONE: {'view_channel': True}, 'Member': {'view_channel': True}}, {},
+     {EVERYONE: {'view_channel': True}}, [('Member', 'view_channel')]),
+    # A base permission does not survive an @everyone deny, so the role allow stays
+    ({EVERYONE: {'view_channel': False}, 'Member': {'view_channel': True}}, {'Member': {'view_channel'}},
+     {EVERYONE: {'view_channel': False}, 'Member': {'view_channel': True}}, []),
+    # Denying what @everyone already denies changes nothing
+    ({EVERYONE: {'send_messages': False}, 'Guest': {'send_messages': False}}, {},
+     {EVERYONE: {'send_messages': False}}, [('Guest', 'send_messages')]),
+    # Administrators bypass overwrites entirely
+    ({'Admin': {'view_channel': False}}, {'Admin': {'administrator'}}, {}, [('Admin', 'view_channel')]),
+    # A grant the role lacks is kept
+    ({'Member': {'attach_files': True}}, {'Member': {'send_messages'}}, {'Member': {'attach_files': True}}, []),
+])
+def test_minimize(overwrites, role_bases, expected, dropped):
+    result, removed = minimize(overwrites, role_bases)
+    assert result == expected
+    assert [(role_name, name) for role_name, name, _ in removed] == dropped
+
+@pytest.mark.parametrize("category, channels, expected", [
+    # Set identically on every channel: moved to the category
+    ({}, [{'A': {'send_messages': True}}, {'A': {'send_messages': True}, 'B': {'view_channel': False}}],
+     {'A': {'send_messages': True}}),
+    # Values differ between channels: nothing moves
+    ({}, [{'A': {'send_messages': True}}, {'A': {'send_messages': False}}], {}),
+    # A single channel is never hoisted
+    ({}, [{'A': {'send_messages': True}}], {}),
+    # Existing category entries are kept
+    ({'B': {'view_channel': True}}, [{'A': {'connect': True}}, {'A': {'connect': True}}],
+     {'B': {'view_channel': True}, 'A': {'connect': True}}),
+])
+def test_hoist(category, channels, expected):
+    assert hoist(category, channels) == expected
+
+def plan(category_permissions, channel_permissions, roles=None):
+    return {
+        'roles': roles if roles is not None else [
+            {'name': 'Member', 'permissions': {'send_messages': True}},
+            {'name': 'Muted', 'permissions': {}},
+        ],
+        'categories': [{
+            'name': 'General',
+            'permissions': category_permissions,
+            'channels': [{'name': f'channel-{i}', 'permissions': perms} for i, perms in enumerate(channel_permissions)],
+        }],
+    }
+
+@pytest.mark.parametrize("category_permissions, channel_permissions, expected_sync", [
+    # No channel overrides: every channel stays synced
+    ({'Muted': {'send_messages': False}}, [{}, {}], [True, True]),
+    # Repeating the category's entry on a channel is still synced
+    ({'Muted': {'send_messages': False}}, [{'Muted': {'send_messages': False}}, {}], [True, True]),
+    # A real difference breaks sync for that channel only
+    ({'Muted': {'send_messages': False}}, [{'Muted': {'send_messages': True}}, {}], [False, True]),
+    # An entry every channel shares is hoisted, so all of them sync
+    ({}, [{'Muted': {'add_reactions': False}}, {'Muted': {'add_reactions': False}}], [True, True]),
+    # A no-op grant on a channel doesn't break sync
+    ({}, [{'Member': {'send_messages': True}}, {}], [True, True]),
+])
+def test_compile_sync(category_permissions, channel_permissions, expected_sync):
+    compiled = compile_permissions(plan(category_permissions, channel_permissions))
+    assert [channel['sync'] for channel in compiled['categories'][0]['channels']] == expected_sync
+    assert compiled['stats']['synced'] == sum(expected_sync)
+
+def test_compile_overridden_deny_keeps_allow():
+    # Member's base grant must be restated, or Muted's deny would win for members with both roles
+    compiled = compile_permissions(plan({'Muted': {'send_messages': False}, 'Member': {'send_messages': True}}, [{}]))
+    assert compiled['categories'][0]['overwrites'] == {
+        'Muted': {'send_messages': False},
+        'Member': {'send_messages': True},
+    }
+
+@pytest.mark.parametrize("category_permissions, warning", [
+    ({'Member': {'read_messages': True, 'view_channel': False}}, "contradicts"),
+    ({'Ghost': {'send_messages': False}}, "not in the plan"),
+    ({EVERYONE: {'view_channel': False}, 'Member': {'send_messages': True, 'attach_files': True}}, "cannot view"),
+])
+def test_compile_warnings(category_permissions, warning):
+    compiled = compile_permissions(plan(category_permissions, [{}]))
+    assert any(warning in text for text in compiled['warnings'])
+
+def test_compile_counts_before_and_after():
+    # Today each channel repeats the category's overwrites, so compiling shrinks the payload
+    compiled = compile_permissions(plan({'Muted': {'send_messages': False}}, [{}, {}, {}]))
+    assert compiled['stats'] == {'before': 4, 'after': 1, 'synced': 3, 'channels': 3}
@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import discord
+import pytest
+from loadtest import FakeGuild
+from snapshots import SnapshotStore, build_snapshot_overwrites, capture_guild, restore_guild
+
+class NoLimit:
+    async def acquire(self):
+        pass
+
+def hidden():
+    return discord.PermissionOverwrite(view_channel=False)
+
+def visible():
+    return discord.PermissionOverwrite(view_channel=True, send_messages=True)
+
+async def build_guild():
+    """A guild with a managed role, a private synced category and a channel with its own overwrites"""
+    guild = FakeGuild(gateway=None, session=None)
+    members = discord.utils.get(guild.roles, name="Members")
+    moderator = await guild.create_role("Moderator", permissions=discord.Permissions(manage_messages=True), hoist=True)
+    integration = await guild.create_role("Integration")
+    integration.managed = True
+    staff = await guild.create_category("Staff", overwrites={guild.default_role: hidden(), moderator: visible()})
+    await guild.create_text_channel("mod-chat", category=staff, overwrites=staff.overwrites)
+    await guild.create_text_channel("mod-log", category=staff, overwrites={moderator: visible()}, topic="Actions")
+    await guild.create_text_channel("announcements", overwrites={members: visible(), guild.owner: visible()})
+    await guild.create_voice_channel("Lounge", bitrate=64000, user_limit=5)
+    return guild
+
+def empty_guild(guild, keep_roles=()):
+    """What a destructive command leaves behind: the default, managed and kept roles and the bot channel"""
+    for role in guild.roles:
+        if not (role.is_default() or role.managed or role.name in keep_roles):
+            guild._roles.remove(role)
+    for channel in guild.channels:
+        if channel.name != "bot-commands":
+            guild._channels.remove(channel)
+
+def restore(guild, snapshot):
+    errors = []
+
+    async def on_error(message):
+        errors.append(message)
+
+    asyncio.run(restore_guild(guild, snapshot, NoLimit(), on_error))
+    return errors
+
+def channel(guild, name):
+    return discord.utils.get(guild.channels, name=name)
+
+def test_capture_records_roles_channels_and_overwrites():
+    guild = asyncio.run(build_guild())
+    snapshot = capture_guild(guild, reason='test')
+    moderator = discord.utils.get(guild.roles, name="Moderator")
+    roles = {data['name']: data for data in snapshot['roles']}
+    assert roles["@everyone"]['default'] and roles["Integration"]['managed']
+    assert roles["Moderator"]['permissions'] == discord.Permissions(manage_messages=True).value
+    channels = {data['name']: data for data in snapshot['channels']}
+    assert channels["mod-chat"]['synced'] and not channels["mod-log"]['synced']
+    assert channels["Lounge"]['user_limit'] == 5
+    overwrites = {data['id']: data['type'] for data in channels["announcements"]['overwrites']}
+    assert overwrites == {discord.utils.get(guild.roles, name="Members").id: 'role', guild.owner.id: 'member'}
+    assert {'id': moderator.id, 'type': 'role', 'allow': visible().pair()[0].value, 'deny': 0} \
+        in channels["mod-log"]['overwrites']
+
+def test_capture_types_uncached_overwrite_targets():
+    guild = FakeGuild(gateway=None, session=None)
+    general = channel(guild, "general")
+    general.overwrites = {discord.Object(1, type=discord.Role): hidden(), discord.Object(2, type=discord.Member): hidden()}
+    assert [data['type'] for data in capture_guild(guild)['channels'][0]['overwrites']] == ['role', 'member']
+
+def test_build_overwrites_remaps_roles():
+    guild = FakeGuild(gateway=None, session=None)
+    new_role = guild.roles[1]
+    overwrites = build_snapshot_overwrites(guild, [
+        {'id': 1, 'type': 'role', 'allow': 1024, 'deny': 0},
+        {'id': 2, 'type': 'role', 'allow': 1024, 'deny': 0},
+        {'id': guild.owner.id, 'type': 'member', 'allow': 0, 'deny': 1024},
+        {'id': 3, 'type': 'member', 'allow': 0, 'deny': 1024},
+    ], {1: new_role})
+    targets = list(overwrites)
+    assert targets[0] is new_role
+    assert targets[1] is guild.owner
+    assert isinstance(targets[2], discord.Object) and targets[2].id == 3
+    assert overwrites[new_role].view_channel is True
+    assert overwrites[guild.owner].view_channel is False
+
+def test_restore_recreates_structure_with_new_roles():
+    guild = asyncio.run(build_guild())
+    snapshot = capture_guild(guild)
+    default, integration = guild.default_role, discord.utils.get(guild.roles, name="Integration")
+    members = discord.utils.get(guild.roles, name="Members")
+    old_moderator = discord.utils.get(guild.roles, name="Moderator")
+    empty_guild(guild, keep_roles=("Members",))
+
+    assert restore(guild, snapshot) == []
+
+    # Default, managed and surviving same-name roles are reused, not duplicated
+    names = [role.name for role in guild.roles]
+    assert sorted(names) == sorted(data['name'] for data in snapshot['roles'])
+    assert guild.default_role is default
+    assert discord.utils.get(guild.roles, name="Integration") is integration
+    assert discord.utils.get(guild.roles, name="Members") is members
+    moderator = discord.utils.get(guild.roles, name="Moderator")
+    assert moderator.id != old_moderator.id
+    assert moderator.permissions.manage_messages and moderator.hoist
+
+    staff = channel(guild, "Staff")
+    assert set(staff.overwrites) == {default, moderator}
+    assert all(target is moderator for target in channel(guild, "mod-log").overwrites)
+    assert channel(guild, "announcements").overwrites.keys() == {members, guild.owner}
+
+    mod_chat = channel(guild, "mod-chat")
+    assert mod_chat.category is staff and mod_chat.permissions_synced
+    assert channel(guild, "mod-log").category is staff and not channel(guild, "mod-log").permissions_synced
+    assert channel(guild, "mod-log").topic == "Actions"
+    assert channel(guild, "Lounge").user_limit == 5
+    assert [c.name for c in guild.channels].count("bot-commands") == 1
+
+def test_synced_channels_inherit_the_restored_category():
+    guild = asyncio.run(build_guild())
+    snapshot = capture_guild(guild)
+    for data in snapshot['channels']:
+        if data['name'] == "mod-log":
+            data['synced'] = True  # Its own overwrites must be ignored
+    empty_guild(guild)
+    assert restore(guild, snapshot) == []
+    assert channel(guild, "mod-log").overwrites == channel(guild, "Staff").overwrites
+
+def test_restore_reports_failures_and_carries_on():
+    guild = asyncio.run(build_guild())
+    snapshot = capture_guild(guild)
+    snapshot['channels'].append({'id': 1, 'name': "stage-door", 'type': 'directory', 'position': 0,
+                                 'category_id': None, 'synced': False, 'overwrites': []})
+    empty_guild(guild)
+    errors = restore(guild, snapshot)
+    assert errors == ["Skipped directory channel stage-door: type cannot be restored"]
+    assert channel(guild, "mod-chat") is not None
+
+def snapshot_at(guild_id, minutes, reason='manual'):
+    taken_at = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=minutes)
+    return {'guild_id': guild_id, 'taken_at': taken_at.isoformat(), 'reason': reason, 'roles': [], 'channels': []}
+
+def test_store_keeps_newest_snapshots_first(tmp_path):
+    store = SnapshotStore(str(tmp_path), retention=3)
+    ids = [store.save(snapshot_at(1, minutes)) for minutes in (5, 1, 4, 2, 3)]
+    assert store.list(1) == [ids[0], ids[2], ids[4]]
+    assert store.list(2) == []
+    assert store.load(1, ids[0]) == snapshot_at(1, 5)
+    with pytest.raises(FileNotFoundError):
+        store.load(1, ids[1])
+
+def test_store_round_trips_a_captured_guild(tmp_path):
+    guild = asyncio.run(build_guild())
+    store = SnapshotStore(str(tmp_path))
+    snapshot = capture_guild(guild, reason='cleanup')
+    snapshot_id = store.save(snapshot)
+    assert snapshot_id.endswith('-cleanup')
+    loaded = store.load(guild.id, snapshot_id)
+    assert loaded == snapshot
+
+    empty_guild(guild)
+    assert restore(guild, loaded) == []
+    assert {c.name for c in guild.channels} == {data['name'] for data in snapshot['channels']}
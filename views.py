@@ -0,0 +1,132 @@
+import discord
+from profiling import span
+
+class AuthorView(discord.ui.View):
+    """Base view that only accepts interactions from the user who ran the command
+
+    The chosen value is stored on `value`; it stays None when the view times out."""
+    def __init__(self, author, timeout):
+        super().__init__(timeout=timeout)
+        self.author = author
+        self.value = None
+        self.message = None
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.author.id:
+            await interaction.response.send_message("Only the person who ran this command can answer.", ephemeral=True)
+            return False
+        return True
+
+    def disable(self):
+        for item in self.children:
+            item.disabled = True
+
+    async def finish(self, interaction, value):
+        self.value = value
+        self.disable()
+        await interaction.response.edit_message(view=self)
+        self.stop()
+
+    async def on_timeout(self):
+        self.disable()
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+class ConfirmView(AuthorView):
+    """Yes/No buttons"""
+    @discord.ui.button(label="Yes", style=discord.ButtonStyle.success)
+    async def yes(self, interaction, button):
+        await self.finish(interaction, True)
+
+    @discord.ui.button(label="No", style=discord.ButtonStyle.danger)
+    async def no(self, interaction, button):
+        await self.finish(interaction, False)
+
+class ChoiceView(AuthorView):
+    """One button per option; the value is the index of the pressed button"""
+    def __init__(self, author, options, timeout):
+        super().__init__(author, timeout)
+        for index, label in enumerate(options):
+            button = discord.ui.Button(label=label, style=discord.ButtonStyle.primary)
+            button.callback = self.make_callback(index)
+            self.add_item(button)
+
+    def make_callback(self, index):
+        async def callback(interaction):
+            await self.finish(interaction, index)
+        return callback
+
+class ChannelPickView(AuthorView):
+    """Text channel select menu; the value is the list of chosen guild channels"""
+    def __init__(self, author, timeout, max_values=1):
+        super().__init__(author, timeout)
+        select = discord.ui.ChannelSelect(
+            channel_types=[discord.ChannelType.text],
+            placeholder="Choose a channel" if max_values == 1 else "Choose channels",
+            min_values=1,
+            max_values=max_values
+        )
+        select.callback = self.make_callback(select)
+        self.add_item(select)
+
+    def make_callback(self, select):
+        async def callback(interaction):
+            channels = [interaction.guild.get_channel(channel.id) for channel in select.values]
+            await self.finish(interaction, [channel for channel in channels if channel is not None])
+        return callback
+
+class TextModal(discord.ui.Modal):
+    """Free-text form opened from a TextPromptView button"""
+    def __init__(self, view, title, label, placeholder):
+        super().__init__(title=title[:45], timeout=view.timeout)
+        self.prompt_view = view
+        self.answer = discord.ui.TextInput(
+            label=label[:45],
+            style=discord.TextStyle.paragraph,
+            placeholder=placeholder[:100] if placeholder else None,
+            max_length=4000
+        )
+        self.add_item(self.answer)
+
+    async def on_submit(self, interaction):
+        await self.prompt_view.finish(interaction, self.answer.value)
+
+class TextPromptView(AuthorView):
+    """A button that opens a modal asking for free text; the value is the submitted text"""
+    def __init__(self, author, timeout, button_label, title, label, placeholder=None):
+        super().__init__(author, timeout)
+        self.title = title
+        self.label = label
+        self.placeholder = placeholder
+        button = discord.ui.Button(label=button_label, style=discord.ButtonStyle.primary)
+        button.callback = self.open_modal
+        self.add_item(button)
+
+    async def open_modal(self, interaction):
+        await interaction.response.send_modal(TextModal(self, self.title, self.label, self.placeholder))
+
+async def prompt(destination, content, view):
+    """Send a message carrying a view and wait until it is answered or times out"""
+    view.message = await destination.send(content, view=view)
+    with span('user_input'):
+        await view.wait()
+    return view.value
+
+async def ask_yes_no(destination, author, question, timeout=30.0):
+    """Return True/False from Yes/No buttons, or None on timeout"""
+    return await prompt(destination, question, ConfirmView(author, timeout))
+
+async def ask_choice(destination, author, question, options, timeout=30.0):
+    """Return the index of the chosen option, or None on timeout"""
+    return await prompt(destination, question, ChoiceView(author, options, timeout))
+
+async def ask_channels(destination, author, question, timeout=30.0, max_values=1):
+    """Return the text channels picked from a select menu, or None on timeout"""
+    return await prompt(destination, question, ChannelPickView(author, timeout, max_values))
+
+async def ask_text(destination, author, question, button_label, title, label, placeholder=None, timeout=60.0):
+    """Return text entered in a modal, or None on timeout"""
+    return await prompt(destination, question, TextPromptView(author, timeout, button_label, title, label, placeholder))